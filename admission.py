@@ -0,0 +1,182 @@
+"""Admission control: per-route-class concurrency limits with load shedding.
+
+Each request is classified (write, dashboard, default, search, export) and
+must take a slot before it runs. When its class is at its limit it waits in
+a bounded queue; if the queue is full or the wait times out the request is
+rejected straight away with 503 + Retry-After instead of tying up a worker.
+Higher-priority classes get freed slots first.
+
+Limits only matter when a worker serves several requests at once, e.g.
+gunicorn --threads N (gthread workers). A queued request still holds one of
+those threads, so every limit is derived from the thread count: the classes
+below 'dashboard' may never occupy (run + wait in) more than the threads
+left after a reserve kept for writes and dashboards.
+"""
+import threading
+import time
+from flask import g, jsonify, request
+
+
+class RouteClass:
+    def __init__(self, name, limit, max_queue, timeout, priority):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.priority = priority
+        self.active = 0
+        self.queued = 0
+        self.queued_total = 0
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+
+    def stats(self):
+        return {
+            'limit': self.limit, 'active': self.active, 'queued': self.queued,
+            'queued_total': self.queued_total, 'admitted': self.admitted,
+            'shed': self.shed, 'timed_out': self.timed_out,
+        }
+
+
+# Classes that may use the reserved threads
+RESERVED_CLASSES = {'write', 'dashboard'}
+
+
+def default_classes(threads):
+    """name: (limit, max_queue, wait timeout in seconds, priority - higher goes first)"""
+    t = threads
+    return {
+        'write': (max(1, t // 2), max(1, t // 2), 5.0, 4),
+        'dashboard': (max(1, t // 2), max(1, t // 4), 3.0, 3),
+        'default': (max(1, t // 2), max(1, t // 4), 3.0, 2),
+        'search': (max(1, t // 4), max(1, t // 8), 2.0, 1),
+        'export': (max(1, t // 8), max(1, t // 8), 1.0, 0),
+    }
+
+# Endpoints that aren't 'default' GETs; any non-GET request counts as a write
+ENDPOINT_CLASSES = {
+    'index': 'dashboard',
+    'api_loyalty_chart': 'dashboard',
+    'api_resource_chart': 'dashboard',
+    'api_metric_history': 'dashboard',
+    'crew_search': 'search',
+    'hostages_filter': 'search',
+    'api_hostages_filter': 'search',
+    'export_crew': 'export',
+    'export_hostages': 'export',
+    'export_resources': 'export',
+    'api_changes': 'export',
+}
+
+# Never queued: static assets and the cheap status/admin endpoints
+EXEMPT_ENDPOINTS = {'static', 'api_admission_stats', 'api_bulk_delete_status', 'api_db_snapshot',
+                    'admin_profiler', 'admin_profiler_collapsed'}
+
+
+class AdmissionController:
+    def __init__(self, app=None, threads=8, classes=None, reserved=None, retry_after=2):
+        self.threads = threads
+        self.max_active = threads
+        # Threads only write/dashboard requests may take
+        self.reserved = min(reserved if reserved is not None else max(1, threads // 4), threads - 1)
+        self.retry_after = retry_after
+        self.classes = {name: RouteClass(name, *spec)
+                        for name, spec in (classes or default_classes(threads)).items()}
+        self.active = 0
+        self._cond = threading.Condition()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    def classify(self, endpoint, method):
+        if method not in ('GET', 'HEAD', 'OPTIONS'):
+            return 'write'
+        return ENDPOINT_CLASSES.get(endpoint, 'default')
+
+    def _can_run(self, rc):
+        if self.active >= self.max_active or rc.active >= rc.limit:
+            return False
+        # Yield to a waiting higher-priority class that could use the slot
+        return not any(other.queued and other.priority > rc.priority and other.active < other.limit
+                       for other in self.classes.values())
+
+    def _unreserved_full(self, rc):
+        if rc.name in RESERVED_CLASSES:
+            return False
+        held = sum(other.active + other.queued for other in self.classes.values()
+                   if other.name not in RESERVED_CLASSES)
+        return held >= self.threads - self.reserved
+
+    def acquire(self, name):
+        """Take a slot for `name`; returns False if the request should be shed"""
+        rc = self.classes[name]
+        with self._cond:
+            # Running or waiting, this request ties up a thread
+            if self._unreserved_full(rc):
+                rc.shed += 1
+                return False
+            # Fast path; arrivals never overtake requests already queued in their class
+            if not rc.queued and self._can_run(rc):
+                return self._admit(rc)
+            if rc.queued >= rc.max_queue:
+                rc.shed += 1
+                return False
+            rc.queued += 1
+            rc.queued_total += 1
+            deadline = time.monotonic() + rc.timeout
+            try:
+                while not self._can_run(rc):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        rc.timed_out += 1
+                        rc.shed += 1
+                        # Lower-priority waiters may have been yielding to us
+                        self._cond.notify_all()
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                rc.queued -= 1
+            return self._admit(rc)
+
+    def _admit(self, rc):
+        rc.active += 1
+        rc.admitted += 1
+        self.active += 1
+        return True
+
+    def release(self, name):
+        with self._cond:
+            self.classes[name].active -= 1
+            self.active -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'threads': self.threads,
+                'reserved': self.reserved,
+                'max_active': self.max_active,
+                'active': self.active,
+                'classes': {name: rc.stats() for name, rc in self.classes.items()},
+            }
+
+    def _before_request(self):
+        if request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+        name = self.classify(request.endpoint, request.method)
+        if not self.acquire(name):
+            response = jsonify({'error': 'Server busy, please retry shortly', 'class': name})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(self.retry_after)
+            return response
+        g.admission_class = name
+        return None
+
+    def _teardown_request(self, exc):
+        name = g.pop('admission_class', None)
+        if name:
+            self.release(name)
@@ -1,8 +1,18 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_file
-from database import Database
-from datetime import datetime
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, send_file, Response, stream_with_context
+from database import Database, SnapshotQueryError
+from bulkdelete import delete_entities, resolve_keys, start_job, job_status
+from changefeed import lock_row, record_change, read_changes, seed_change_log
+from admission import AdmissionController
+from facets import PAGE_SIZE, parse_filters, filter_hostages
+from profiler import SamplingProfiler
+from history import METRICS, RESOLUTIONS, record_metric, query_metric, apply_retention
+from snapshot import export_snapshot
+from datetime import datetime, timedelta
+import click
 import csv
 import io
+import json
+import math
 import os
 from dotenv import load_dotenv
 
@@ -17,7 +27,48 @@ db = Database(
     host=os.getenv('DB_HOST', 'localhost'),
     user=os.getenv('DB_USER', 'root'),
     password=os.getenv('DB_PASSWORD', ''),
-    database=os.getenv('DB_NAME', 'bellaciao_db')
+    database=os.getenv('DB_NAME', 'bellaciao_db'),
+    port=int(os.getenv('DB_PORT', 3306)),
+    replicas=os.getenv('DB_REPLICAS', '').split(','),
+    max_replica_lag=int(os.getenv('DB_MAX_REPLICA_LAG', 5)),
+    snapshot_path=os.getenv('SNAPSHOT_PATH') or None,
+    snapshot_mode=os.getenv('SNAPSHOT_MODE', 'off'),
+    connect_timeout=int(os.getenv('DB_CONNECT_TIMEOUT', 3))
+)
+
+@app.before_request
+def begin_db_request():
+    # Read-your-writes follows the user's session, not the worker thread
+    db.begin_request(session.get('db_last_write', 0.0))
+
+@app.after_request
+def remember_db_write(response):
+    last_write = db.last_write()
+    if last_write is not None:
+        session['db_last_write'] = last_write
+    return response
+
+@app.context_processor
+def snapshot_notice():
+    """Tell templates when the page was served from the offline snapshot"""
+    if db.snapshot_mode == 'readonly' or db.used_snapshot():
+        try:
+            return {'snapshot_served': True, 'snapshot_created_at': db.snapshot.created_at()}
+        except Exception:
+            return {'snapshot_served': True, 'snapshot_created_at': None}
+    return {'snapshot_served': False}
+
+# Copy deleted crew/hostages/phases and their dependents to ARCHIVE_ tables
+ARCHIVE_ON_DELETE = os.getenv('ARCHIVE_ON_DELETE', '').lower() in ('1', 'true', 'yes')
+
+# Per-route-class concurrency limits and load shedding
+admission = AdmissionController(app, threads=int(os.getenv('WEB_THREADS', 8)))
+
+# Sampling profiler: per route, per request (X-Profile header) or a random fraction
+profiler = SamplingProfiler(app,
+    sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', 0)),
+    routes=[r for r in os.getenv('PROFILE_ROUTES', '').split(',') if r],
+    token=os.getenv('PROFILER_TOKEN') or None
 )
 
 # ============================================================================
@@ -169,7 +220,7 @@ def hostages_list():
             LEFT JOIN IS_LOCATED_IN il ON h.HostageID = il.h_id
             LEFT JOIN HEIST_BLUEPRINT hb ON il.BPid = hb.BlueprintID
             ORDER BY h.Status, h.Usefulness DESC
-        """)
+        """, rows='record')
         
         return render_template('hostages.html', hostages=hostages)
     except Exception as e:
@@ -270,29 +321,144 @@ def phases_list():
 
 @app.route('/api/loyalty-chart')
 def api_loyalty_chart():
-    """API endpoint for loyalty chart data"""
+    """API endpoint for loyalty chart data ({column: [values...]})"""
     try:
         data = db.execute_query("""
             SELECT CodeName, LoyaltyScore 
             FROM CREW_MEMBER 
             ORDER BY LoyaltyScore DESC
-        """)
+        """, rows='columnar')
         return jsonify(data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/resource-chart')
 def api_resource_chart():
-    """API endpoint for resource status chart"""
+    """API endpoint for resource status chart ({column: [values...]})"""
     try:
         data = db.execute_query("""
             SELECT Type, CurrentQuantity, CriticalThreshold 
             FROM RESOURCE
-        """)
+        """, rows='columnar')
         return jsonify(data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/db/replicas')
+def api_db_replicas():
+    """API endpoint for read replica health and lag"""
+    return jsonify(db.replica_status())
+
+@app.route('/api/db/snapshot')
+def api_db_snapshot():
+    """API endpoint for the offline snapshot mode and age"""
+    return jsonify(db.snapshot_status())
+
+@app.route('/api/admission')
+def api_admission_stats():
+    """API endpoint for admission control counters (active/queued/shed per class)"""
+    return jsonify(admission.stats())
+
+@app.route('/api/changes')
+def api_changes():
+    """API endpoint for delta sync: rows changed since a cursor, as NDJSON.
+
+    Each line is one change ({"seq", "table", "key", "op", "row"}; deletes
+    are tombstones without a row). The last line carries the cursor to send
+    next time and whether more changes are waiting, plus "error" if the
+    stream was cut short.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = max(1, min(int(request.args.get('limit', 1000)), 10000))
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    if db.serving_snapshot():
+        # A frozen snapshot has no settled tail to hand out cursors from
+        response = jsonify({'error': 'Delta sync is unavailable while serving from the offline snapshot'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(db.outage_cooldown)
+        return response
+
+    def generate(cursor):
+        remaining = limit
+        has_more = False
+        # Stream in pages so large catch-ups never sit in memory at once.
+        # The log and the rows it points at must come from the same server.
+        try:
+            with db.primary():
+                while remaining > 0:
+                    changes, cursor, has_more = read_changes(db, cursor, min(remaining, 500))
+                    for change in changes:
+                        yield json.dumps(change, default=str) + '\n'
+                    remaining -= len(changes)
+                    if not has_more:
+                        break
+        except Exception as e:
+            # The headers are already sent: end with an error line carrying the
+            # cursor of the last complete page so the client can resume from it
+            yield json.dumps({'cursor': cursor, 'has_more': True, 'error': str(e)}) + '\n'
+            return
+        yield json.dumps({'cursor': cursor, 'has_more': has_more}) + '\n'
+
+    return Response(stream_with_context(generate(since)), mimetype='application/x-ndjson')
+
+@app.route('/api/history/<metric>/<key>')
+def api_metric_history(metric, key):
+    """API endpoint for downsampled loyalty / resource level history.
+
+    Query args: start and end (ISO timestamps, default the last 24 hours),
+    points (max buckets returned, default 500) and optional resolution.
+    """
+    if metric not in METRICS:
+        return jsonify({'error': f'Unknown metric {metric}'}), 404
+    try:
+        end = datetime.fromisoformat(request.args['end']) if 'end' in request.args else datetime.now()
+        start = (datetime.fromisoformat(request.args['start']) if 'start' in request.args
+                 else end - timedelta(days=1))
+        points = max(1, min(int(request.args.get('points', 500)), 5000))
+        resolution = request.args.get('resolution') or None
+        if resolution and resolution not in RESOLUTIONS:
+            raise ValueError(f'resolution must be one of {", ".join(RESOLUTIONS)}')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        rows, resolution = query_metric(db, metric, key, start, end, points, resolution)
+        return jsonify({
+            'metric': metric,
+            'key': key,
+            'resolution': resolution,
+            'points': [{'t': r['t'].isoformat(), 'min': r['min'], 'max': r['max'],
+                        'avg': float(r['avg']), 'last': int(r['last'])} for r in rows]
+        })
+    except SnapshotQueryError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.cli.command('history-retention')
+def history_retention():
+    """Purge metric samples and rollups past their retention window"""
+    deleted = apply_retention(db)
+    print(f'Deleted {deleted} expired history rows')
+
+@app.cli.command('changefeed-seed')
+def changefeed_seed():
+    """Log existing rows so a since=0 sync returns them"""
+    seeded = seed_change_log(db)
+    print(f'Logged {sum(seeded.values())} existing rows to CHANGE_LOG')
+
+@app.cli.command('snapshot-export')
+@click.argument('path', required=False)
+def snapshot_export(path):
+    """Write a read-only snapshot of every table to PATH (default SNAPSHOT_PATH)"""
+    path = path or os.getenv('SNAPSHOT_PATH')
+    if not path:
+        raise click.UsageError('Give a path or set SNAPSHOT_PATH')
+    counts = export_snapshot(db, path)
+    print(f'Wrote {sum(counts.values())} rows from {len(counts)} tables to {path}')
+
 # ============================================================================
 # CREW - ADD/EDIT/DELETE
 # ============================================================================
@@ -309,10 +475,13 @@ def crew_add():
             specialization = request.form['specialization']
             loyalty_score = request.form['loyalty_score']
             
-            db.execute_insert("""
-                INSERT INTO CREW_MEMBER (CodeName, HeistID, FirstName, LastName, Specialization, LoyaltyScore)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (codename, heist_id, first_name, last_name, specialization, loyalty_score))
+            with db.transaction() as uow:
+                uow.execute("""
+                    INSERT INTO CREW_MEMBER (CodeName, HeistID, FirstName, LastName, Specialization, LoyaltyScore)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (codename, heist_id, first_name, last_name, specialization, loyalty_score))
+                record_change(uow, 'CREW_MEMBER', codename)
+                record_metric(uow, 'loyalty', codename, loyalty_score)
             
             flash(f'Crew member {codename} added successfully!', 'success')
             return redirect(url_for('crew_list'))
@@ -331,11 +500,18 @@ def crew_edit(codename):
             specialization = request.form['specialization']
             loyalty_score = request.form['loyalty_score']
             
-            db.execute_update("""
-                UPDATE CREW_MEMBER 
-                SET FirstName = %s, LastName = %s, Specialization = %s, LoyaltyScore = %s
-                WHERE CodeName = %s
-            """, (first_name, last_name, specialization, loyalty_score, codename))
+            with db.transaction() as uow:
+                updated = uow.execute("""
+                    UPDATE CREW_MEMBER 
+                    SET FirstName = %s, LastName = %s, Specialization = %s, LoyaltyScore = %s
+                    WHERE CodeName = %s
+                """, (first_name, last_name, specialization, loyalty_score, codename))
+                # 0 rows: unknown crew member, or nothing changed (no log entry either way)
+                if updated:
+                    record_change(uow, 'CREW_MEMBER', codename)
+                    record_metric(uow, 'loyalty', codename, loyalty_score)
+                elif not uow.fetch("SELECT 1 FROM CREW_MEMBER WHERE CodeName = %s", (codename,)):
+                    raise LookupError(f'No crew member {codename}')
             
             flash(f'Crew member {codename} updated successfully!', 'success')
             return redirect(url_for('crew_list'))
@@ -355,7 +531,8 @@ def crew_edit(codename):
 def crew_delete(codename):
     """Delete crew member"""
     try:
-        db.execute_delete("DELETE FROM CREW_MEMBER WHERE CodeName = %s", (codename,))
+        # Dependents go first in short chunked transactions instead of one big cascade
+        delete_entities(db, 'crew', [codename], archive=ARCHIVE_ON_DELETE)
         flash(f'Crew member {codename} deleted successfully!', 'success')
     except Exception as e:
         flash(f'Error deleting crew member: {str(e)}', 'danger')
@@ -379,10 +556,12 @@ def hostage_add():
             manager = request.form.get('manager') or None
             blueprint_id = request.form.get('blueprint_id') or None
             
-            db.execute_insert("""
-                INSERT INTO HOSTAGE (HostageID, FirstName, LastName, Status, Usefulness, InstigatorFlag, ManagerCodename, BlueprintID)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (hostage_id, first_name, last_name, status, usefulness, instigator, manager, blueprint_id))
+            with db.transaction() as uow:
+                uow.execute("""
+                    INSERT INTO HOSTAGE (HostageID, FirstName, LastName, Status, Usefulness, InstigatorFlag, ManagerCodename, BlueprintID)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, (hostage_id, first_name, last_name, status, usefulness, instigator, manager, blueprint_id))
+                record_change(uow, 'HOSTAGE', hostage_id)
             
             flash(f'Hostage {first_name} {last_name} added successfully!', 'success')
             return redirect(url_for('hostages_list'))
@@ -403,11 +582,16 @@ def hostage_edit(hostage_id):
             usefulness = request.form['usefulness']
             instigator = 'instigator' in request.form
             
-            db.execute_update("""
-                UPDATE HOSTAGE 
-                SET Status = %s, Usefulness = %s, InstigatorFlag = %s
-                WHERE HostageID = %s
-            """, (status, usefulness, instigator, hostage_id))
+            with db.transaction() as uow:
+                updated = uow.execute("""
+                    UPDATE HOSTAGE 
+                    SET Status = %s, Usefulness = %s, InstigatorFlag = %s
+                    WHERE HostageID = %s
+                """, (status, usefulness, instigator, hostage_id))
+                if updated:
+                    record_change(uow, 'HOSTAGE', hostage_id)
+                elif not uow.fetch("SELECT 1 FROM HOSTAGE WHERE HostageID = %s", (hostage_id,)):
+                    raise LookupError(f'No hostage #{hostage_id}')
             
             flash(f'Hostage #{hostage_id} updated successfully!', 'success')
             return redirect(url_for('hostages_list'))
@@ -425,7 +609,7 @@ def hostage_edit(hostage_id):
 def hostage_delete(hostage_id):
     """Delete hostage"""
     try:
-        db.execute_delete("DELETE FROM HOSTAGE WHERE HostageID = %s", (hostage_id,))
+        delete_entities(db, 'hostage', [hostage_id], archive=ARCHIVE_ON_DELETE)
         flash(f'Hostage #{hostage_id} deleted successfully!', 'success')
     except Exception as e:
         flash(f'Error deleting hostage: {str(e)}', 'danger')
@@ -440,9 +624,15 @@ def resource_update(resource_id):
     """Update resource quantity"""
     try:
         new_quantity = request.form['quantity']
-        db.execute_update("""
-            UPDATE RESOURCE SET CurrentQuantity = %s WHERE ResourceID = %s
-        """, (new_quantity, resource_id))
+        with db.transaction() as uow:
+            updated = uow.execute("""
+                UPDATE RESOURCE SET CurrentQuantity = %s WHERE ResourceID = %s
+            """, (new_quantity, resource_id))
+            if updated:
+                record_change(uow, 'RESOURCE', resource_id)
+                record_metric(uow, 'resource_quantity', resource_id, new_quantity)
+            elif not uow.fetch("SELECT 1 FROM RESOURCE WHERE ResourceID = %s", (resource_id,)):
+                raise LookupError(f'No resource #{resource_id}')
         flash('Resource quantity updated successfully!', 'success')
     except Exception as e:
         flash(f'Error updating resource: {str(e)}', 'danger')
@@ -456,13 +646,19 @@ def api_resource_update(resource_id):
         if new_quantity < 0:
             return jsonify({'success': False, 'error': 'Quantity cannot be negative'}), 400
 
-        db.execute_update("""
-            UPDATE RESOURCE SET CurrentQuantity = %s WHERE ResourceID = %s
-        """, (new_quantity, resource_id))
+        # Update and read back on one primary connection in one transaction
+        with db.transaction() as uow:
+            updated = uow.execute("""
+                UPDATE RESOURCE SET CurrentQuantity = %s WHERE ResourceID = %s
+            """, (new_quantity, resource_id))
+            # Nothing is logged for an unknown resource (404 below) or an unchanged quantity
+            if updated:
+                record_change(uow, 'RESOURCE', resource_id)
+                record_metric(uow, 'resource_quantity', resource_id, new_quantity)
 
-        resource = db.execute_query(
-            "SELECT * FROM RESOURCE WHERE ResourceID = %s", (resource_id,)
-        )
+            resource = uow.fetch(
+                "SELECT * FROM RESOURCE WHERE ResourceID = %s", (resource_id,)
+            )
         if not resource:
             return jsonify({'success': False, 'error': 'Resource not found'}), 404
         resource = resource[0]
@@ -494,10 +690,12 @@ def phase_add():
             duration = request.form['duration']
             dissonance = request.form.get('dissonance', 0)
             
-            db.execute_insert("""
-                INSERT INTO PLAN_PHASE (PhaseID, Phasecodename, Planned_Duration, Current_Dissonance)
-                VALUES (%s, %s, %s, %s)
-            """, (phase_id, codename, duration, dissonance))
+            with db.transaction() as uow:
+                uow.execute("""
+                    INSERT INTO PLAN_PHASE (PhaseID, Phasecodename, Planned_Duration, Current_Dissonance)
+                    VALUES (%s, %s, %s, %s)
+                """, (phase_id, codename, duration, dissonance))
+                record_change(uow, 'PLAN_PHASE', phase_id)
             
             flash(f'Phase {codename} added successfully!', 'success')
             return redirect(url_for('phases_list'))
@@ -510,12 +708,112 @@ def phase_add():
 def phase_delete(phase_id):
     """Delete phase"""
     try:
-        db.execute_delete("DELETE FROM PLAN_PHASE WHERE PhaseID = %s", (phase_id,))
+        delete_entities(db, 'phase', [phase_id], archive=ARCHIVE_ON_DELETE)
         flash(f'Phase deleted successfully!', 'success')
     except Exception as e:
         flash(f'Error deleting phase: {str(e)}', 'danger')
     return redirect(url_for('phases_list'))
 
+# ============================================================================
+# PROFILER ADMIN
+# ============================================================================
+
+def profiler_authorized():
+    """Admin profiler endpoints need PROFILER_TOKEN set and sent as X-Profiler-Token"""
+    return bool(profiler.token) and request.headers.get('X-Profiler-Token') == profiler.token
+
+@app.route('/admin/profiler', methods=['GET', 'POST'])
+def admin_profiler():
+    """Profiler status and top-N hotspots; POST toggles routes, sample rate or resets"""
+    if not profiler_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        if not isinstance(body, dict):
+            return jsonify({'error': 'Body must be a JSON object'}), 400
+        # Validate everything before changing anything
+        for field in ('enable', 'disable'):
+            routes = body.get(field, [])
+            if not isinstance(routes, list) or not all(isinstance(r, str) for r in routes):
+                return jsonify({'error': f'{field} must be a list of endpoint names'}), 400
+        sample_rate = body.get('sample_rate')
+        if sample_rate is not None:
+            try:
+                if isinstance(sample_rate, bool):
+                    raise ValueError
+                sample_rate = float(sample_rate)
+                if not math.isfinite(sample_rate):
+                    raise ValueError
+            except (TypeError, ValueError):
+                return jsonify({'error': 'sample_rate must be a number between 0 and 1'}), 400
+
+        profiler.routes.update(body.get('enable', []))
+        profiler.routes.difference_update(body.get('disable', []))
+        if sample_rate is not None:
+            profiler.sample_rate = max(0.0, min(sample_rate, 1.0))
+        if body.get('reset'):
+            profiler.reset()
+    
+    return jsonify(profiler.report(
+        top=request.args.get('top', 20, type=int),
+        route=request.args.get('route') or None
+    ))
+
+@app.route('/admin/profiler/collapsed')
+def admin_profiler_collapsed():
+    """Collapsed stacks for flamegraph.pl / speedscope"""
+    if not profiler_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    return Response(profiler.collapsed(request.args.get('route') or None), mimetype='text/plain')
+
+# ============================================================================
+# BULK DELETE / ARCHIVE
+# ============================================================================
+
+@app.route('/api/bulk-delete', methods=['POST'])
+def api_bulk_delete():
+    """Start a background chunked delete of many crew members, hostages or phases.
+
+    JSON body: {"entity": "hostage", "keys": [...]} or a selector such as
+    {"entity": "hostage", "selector": "blueprint", "value": 2}, plus optional
+    "archive": true. Returns 202 with a job id to poll.
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Body must be a JSON object'}), 400
+    archive = body.get('archive', ARCHIVE_ON_DELETE)
+    if not isinstance(archive, bool):
+        return jsonify({'error': 'archive must be true or false'}), 400
+    entity = body.get('entity')
+    try:
+        keys = resolve_keys(db, entity, body.get('keys'), body.get('selector'), body.get('value'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not keys:
+        return jsonify({'error': 'Nothing matches'}), 404
+
+    try:
+        description = (f"{body['selector']}={body.get('value')}" if body.get('selector')
+                       else f"{len(keys)} keys")
+        job_id = start_job(db, entity, keys, archive, description)
+        return jsonify({'job_id': job_id, 'total': len(keys),
+                        'status_url': url_for('api_bulk_delete_status', job_id=job_id)}), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/bulk-delete/<int:job_id>')
+def api_bulk_delete_status(job_id):
+    """API endpoint for bulk delete job progress"""
+    try:
+        with db.primary():
+            job = job_status(db, job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ============================================================================
 # SEARCH & FILTER
 # ============================================================================
@@ -561,27 +859,30 @@ def crew_search():
 
 @app.route('/hostages/filter')
 def hostages_filter():
-    """Filter hostages by status"""
-    status = request.args.get('status', '').strip()
+    """Filter hostages by any combination of facets, with counts per facet value"""
+    filters = parse_filters(request.args)
+    page = max(1, request.args.get('page', 1, type=int))
     
     try:
-        if status:
-            hostages = db.execute_query("""
-                SELECT h.*, hb.LocationName
-                FROM HOSTAGE h
-                LEFT JOIN IS_LOCATED_IN il ON h.HostageID = il.h_id
-                LEFT JOIN HEIST_BLUEPRINT hb ON il.BPid = hb.BlueprintID
-                WHERE h.Status = %s
-                ORDER BY h.Usefulness DESC
-            """, (status,))
-        else:
-            return redirect(url_for('hostages_list'))
-        
-        return render_template('hostages.html', hostages=hostages, filter_status=status)
+        hostages, facets, total = filter_hostages(db, filters, page, rows='record')
+        return render_template('hostages.html', hostages=hostages, facets=facets,
+            filters=filters, total=total, page=page, page_size=PAGE_SIZE
+        )
     except Exception as e:
         flash(f'Filter error: {str(e)}', 'danger')
         return redirect(url_for('hostages_list'))
 
+@app.route('/api/hostages/filter')
+def api_hostages_filter():
+    """API endpoint for the filter panel: one page of results plus all facet counts"""
+    filters = parse_filters(request.args)
+    page = max(1, request.args.get('page', 1, type=int))
+    try:
+        hostages, facets, total = filter_hostages(db, filters, page)
+        return jsonify({'hostages': hostages, 'facets': facets, 'total': total, 'page': page})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Add after your existing phase routes
 
 @app.route('/phases/<int:phase_id>/assign-crew', methods=['GET', 'POST'])
@@ -589,20 +890,20 @@ def phase_assign_crew(phase_id):
     """Assign crew to a phase"""
     if request.method == 'POST':
         try:
-            crew_codename = request.form['crew_codename']
+            crew_codenames = [c for c in request.form.getlist('crew_codename') if c]
             
-            # Check if already assigned
-            existing = db.execute_query("""
-                SELECT * FROM ASSIGNED_TO WHERE Cname = %s AND Phase_id = %s
-            """, (crew_codename, phase_id))
+            # Single transaction; already-assigned members are skipped by the upsert
+            with db.transaction() as uow:
+                lock_row(uow, 'PLAN_PHASE', phase_id)
+                added = uow.insert_ignore('ASSIGNED_TO', ('Cname', 'Phase_id'),
+                                          [(c, phase_id) for c in crew_codenames])
+                if added:
+                    record_change(uow, 'PLAN_PHASE', phase_id)
             
-            if existing:
+            if not added:
                 flash('Crew member already assigned to this phase!', 'warning')
             else:
-                db.execute_insert("""
-                    INSERT INTO ASSIGNED_TO (Cname, Phase_id) VALUES (%s, %s)
-                """, (crew_codename, phase_id))
-                flash(f'Crew member {crew_codename} assigned successfully!', 'success')
+                flash(f'{added} crew member(s) assigned successfully!', 'success')
             
             return redirect(url_for('phases_list'))
         except Exception as e:
@@ -632,20 +933,19 @@ def phase_assign_resource(phase_id):
     """Assign resource to a phase"""
     if request.method == 'POST':
         try:
-            resource_id = request.form['resource_id']
+            resource_ids = [r for r in request.form.getlist('resource_id') if r]
             
-            # Check if already assigned
-            existing = db.execute_query("""
-                SELECT * FROM REQUIRES WHERE Phase = %s AND Res_id = %s
-            """, (phase_id, resource_id))
+            with db.transaction() as uow:
+                lock_row(uow, 'PLAN_PHASE', phase_id)
+                added = uow.insert_ignore('REQUIRES', ('Phase', 'Res_id'),
+                                          [(phase_id, r) for r in resource_ids])
+                if added:
+                    record_change(uow, 'PLAN_PHASE', phase_id)
             
-            if existing:
+            if not added:
                 flash('Resource already assigned to this phase!', 'warning')
             else:
-                db.execute_insert("""
-                    INSERT INTO REQUIRES (Phase, Res_id) VALUES (%s, %s)
-                """, (phase_id, resource_id))
-                flash('Resource assigned successfully!', 'success')
+                flash(f'{added} resource(s) assigned successfully!', 'success')
             
             return redirect(url_for('phases_list'))
         except Exception as e:
@@ -674,9 +974,11 @@ def phase_assign_resource(phase_id):
 def phase_remove_crew(phase_id, codename):
     """Remove crew from phase"""
     try:
-        db.execute_delete("""
-            DELETE FROM ASSIGNED_TO WHERE Cname = %s AND Phase_id = %s
-        """, (codename, phase_id))
+        with db.transaction() as uow:
+            if uow.execute("""
+                DELETE FROM ASSIGNED_TO WHERE Cname = %s AND Phase_id = %s
+            """, (codename, phase_id)):
+                record_change(uow, 'PLAN_PHASE', phase_id)
         flash(f'Crew member {codename} removed from phase!', 'success')
     except Exception as e:
         flash(f'Error removing crew: {str(e)}', 'danger')
@@ -686,9 +988,11 @@ def phase_remove_crew(phase_id, codename):
 def phase_remove_resource(phase_id, resource_id):
     """Remove resource from phase"""
     try:
-        db.execute_delete("""
-            DELETE FROM REQUIRES WHERE Phase = %s AND Res_id = %s
-        """, (phase_id, resource_id))
+        with db.transaction() as uow:
+            if uow.execute("""
+                DELETE FROM REQUIRES WHERE Phase = %s AND Res_id = %s
+            """, (phase_id, resource_id)):
+                record_change(uow, 'PLAN_PHASE', phase_id)
         flash('Resource removed from phase!', 'success')
     except Exception as e:
         flash(f'Error removing resource: {str(e)}', 'danger')
@@ -706,21 +1010,13 @@ def export_crew():
             SELECT CodeName, FirstName, LastName, Specialization, LoyaltyScore
             FROM CREW_MEMBER
             ORDER BY LoyaltyScore DESC
-        """)
+        """, rows='tuple')
         
         # Create CSV in memory
         output = io.StringIO()
         writer = csv.writer(output)
-        writer.writerow(['CodeName', 'FirstName', 'LastName', 'Specialization', 'LoyaltyScore'])
-        
-        for member in crew:
-            writer.writerow([
-                member['CodeName'],
-                member['FirstName'],
-                member['LastName'],
-                member['Specialization'],
-                member['LoyaltyScore']
-            ])
+        writer.writerow(crew.columns)
+        writer.writerows(crew)
         
         # Create response
         output.seek(0)
@@ -739,24 +1035,16 @@ def export_hostages():
     """Export hostages to CSV"""
     try:
         hostages = db.execute_query("""
-            SELECT HostageID, FirstName, LastName, Status, Usefulness, ManagerCodename
+            SELECT HostageID, FirstName, LastName, Status, Usefulness,
+                   COALESCE(ManagerCodename, 'None') AS Manager
             FROM HOSTAGE
             ORDER BY Status
-        """)
+        """, rows='tuple')
         
         output = io.StringIO()
         writer = csv.writer(output)
-        writer.writerow(['HostageID', 'FirstName', 'LastName', 'Status', 'Usefulness', 'Manager'])
-        
-        for h in hostages:
-            writer.writerow([
-                h['HostageID'],
-                h['FirstName'],
-                h['LastName'],
-                h['Status'],
-                h['Usefulness'],
-                h['ManagerCodename'] or 'None'
-            ])
+        writer.writerow(hostages.columns)
+        writer.writerows(hostages)
         
         output.seek(0)
         return send_file(
@@ -773,19 +1061,15 @@ def export_hostages():
 def export_resources():
     """Export resources to CSV"""
     try:
-        resources = db.execute_query("SELECT * FROM RESOURCE ORDER BY Type")
+        resources = db.execute_query("""
+            SELECT ResourceID, Type, CurrentQuantity, CriticalThreshold
+            FROM RESOURCE ORDER BY Type
+        """, rows='tuple')
         
         output = io.StringIO()
         writer = csv.writer(output)
-        writer.writerow(['ResourceID', 'Type', 'CurrentQuantity', 'CriticalThreshold'])
-        
-        for r in resources:
-            writer.writerow([
-                r['ResourceID'],
-                r['Type'],
-                r['CurrentQuantity'],
-                r['CriticalThreshold']
-            ])
+        writer.writerow(resources.columns)
+        writer.writerows(resources)
         
         output.seek(0)
         return send_file(
@@ -809,10 +1093,14 @@ def resource_add():
             critical_threshold = request.form['critical_threshold']
             
             # INSERT without ResourceID
-            db.execute_insert("""
-                INSERT INTO RESOURCE (Type, CurrentQuantity, CriticalThreshold)
-                VALUES (%s, %s, %s)
-            """, (resource_type, current_quantity, critical_threshold))
+            with db.transaction() as uow:
+                uow.execute("""
+                    INSERT INTO RESOURCE (Type, CurrentQuantity, CriticalThreshold)
+                    VALUES (%s, %s, %s)
+                """, (resource_type, current_quantity, critical_threshold))
+                resource_id = uow.lastrowid
+                record_change(uow, 'RESOURCE', resource_id)
+                record_metric(uow, 'resource_quantity', resource_id, current_quantity)
             
             flash(f'Resource "{resource_type}" added successfully!', 'success')
             return redirect(url_for('resources_list'))
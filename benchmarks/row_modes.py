@@ -0,0 +1,59 @@
+"""Memory and build-time comparison of the Database row modes.
+
+Builds HOSTAGE-shaped rows (the widest listing/export) in each mode from the
+raw tuples the driver returns and reports everything still alive afterwards
+(values included), measured with tracemalloc. Dict mode drops the driver
+tuples, as DictCursor does. No database needed:
+
+    python benchmarks/row_modes.py [row_count]
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ROW_MODES, shape_rows  # noqa: E402
+
+COLUMNS = ('HostageID', 'FirstName', 'LastName', 'Status', 'Usefulness',
+           'InstigatorFlag', 'ManagerCodename', 'BlueprintID', 'LocationName')
+STATUSES = ('Cooperative', 'Neutral', 'Resistant', 'Hostile')
+
+
+def raw_rows(count):
+    # Distinct strings per row, like freshly decoded driver results
+    return [(i, f'First{i}', f'Last{i}', STATUSES[i % 4], i % 11, i % 7 == 0,
+             f'Crew{i % 50}', i % 3 + 1, f'Location {i % 3 + 1}') for i in range(count)]
+
+
+def measure(mode, count):
+    gc.collect()
+    tracemalloc.start()
+    rows = raw_rows(count)
+    started = time.perf_counter()
+    result = shape_rows(rows, COLUMNS, mode)
+    elapsed = time.perf_counter() - started
+    del rows
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return retained, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    print(f'{count:,} rows x {len(COLUMNS)} columns\n')
+    print(f'{"mode":<10} {"retained":>12} {"per row":>10} {"build":>10}')
+    baseline = None
+    for mode in ROW_MODES:
+        retained, elapsed = measure(mode, count)
+        baseline = baseline or retained
+        print(f'{mode:<10} {retained / 1e6:>9.1f} MB {retained / count:>8.0f} B '
+              f'{elapsed * 1000:>7.0f} ms  ({retained / baseline:.0%} of dict)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+"""Chunked, lock-friendly deletes (and optional archival) of crew, hostages and phases.
+
+A plain DELETE on CREW_MEMBER / HOSTAGE / PLAN_PHASE cascades through every
+dependent table in one transaction and holds its locks until the whole tree
+is gone. That is fine for a small tree, so when all dependents fit in one
+chunk the delete is still a single cascading transaction. Larger trees have
+their dependents removed first, a bounded chunk per short transaction (all on
+one connection), then the parent rows in a final transaction that also
+takes (and archives) any dependents added meanwhile, so other writers only
+ever wait for one chunk. An interrupted chunked delete leaves the parents in place
+with fewer dependents; running it again finishes the job. With archive=True
+rows are appended to their ARCHIVE_ table in the same transaction before they
+are deleted; archive tables have no unique keys, so nothing is overwritten.
+
+Large jobs run in a background thread; progress lives in BULK_JOB so any
+worker can report it. The thread stamps a heartbeat while it runs, and a job
+whose heartbeat stops (its worker was restarted or killed) is marked failed
+the next time anyone asks for its status. Deletes are idempotent, so
+submitting the same job again finishes it.
+"""
+import os
+import socket
+import threading
+import time
+import traceback
+
+from changefeed import record_change, record_changes
+
+CHUNK_SIZE = 500       # rows per dependent-table transaction
+ENTITY_BATCH = 100     # parent keys handled per pass
+CHUNK_PAUSE = 0.01     # seconds between chunks so queued writers get the locks
+HEARTBEAT = 10         # seconds between job heartbeats
+STALE_AFTER = 120      # a running job without a heartbeat this long is dead
+
+PRIMARY_KEYS = {
+    'CREW_MEMBER': ('CodeName',),
+    'HOSTAGE': ('HostageID',),
+    'PLAN_PHASE': ('PhaseID',),
+    'TRAITS': ('Crew_No', 'VolatileTraits'),
+    'STRATEGIC_CREW': ('Codename',),
+    'TACTICAL_CREW': ('Codename',),
+    'TECHNICAL_CREW': ('Codename',),
+    'PSYCHOLOGICAL_REPORT': ('Crew_Member', 'ReportTimestamp'),
+    'HOSTAGE_LOG': ('HostageID', 'Interaction_Timestamp'),
+    'ASSIGNED_TO': ('Cname', 'Phase_id'),
+    'REQUIRES': ('Phase', 'Res_id'),
+    'DEVIATES_FROM': ('C_id', 'P_id'),
+    'COMMUNICATES_WITH': ('Codeid', 'Uid'),
+    'IS_LOCATED_IN': ('h_id', 'BPid'),
+    'NEGOTIATION': ('P_unit', 'crew_id', 'Hostageid', 'resource_id'),
+    'TASK_ASSIGNMENT': ('PID', 'CName', 'ResID', 'BID'),
+}
+
+# entity: parent table, key column, dependents as (table, fk column, synced
+# table whose rows change when these go, column holding that row's key),
+# and ON DELETE SET NULL references as (table, fk column)
+PLANS = {
+    'crew': {
+        'table': 'CREW_MEMBER', 'key': 'CodeName',
+        'dependents': [
+            ('TRAITS', 'Crew_No', None, None),
+            ('STRATEGIC_CREW', 'Codename', None, None),
+            ('TACTICAL_CREW', 'Codename', None, None),
+            ('TECHNICAL_CREW', 'Codename', None, None),
+            ('PSYCHOLOGICAL_REPORT', 'Crew_Member', None, None),
+            ('HOSTAGE_LOG', 'Interacting_Crew', None, None),
+            ('ASSIGNED_TO', 'Cname', 'PLAN_PHASE', 'Phase_id'),
+            ('DEVIATES_FROM', 'C_id', None, None),
+            ('COMMUNICATES_WITH', 'Codeid', None, None),
+            ('NEGOTIATION', 'crew_id', None, None),
+            ('TASK_ASSIGNMENT', 'CName', None, None),
+        ],
+        'nullify': [('HOSTAGE', 'ManagerCodename')],
+    },
+    'hostage': {
+        'table': 'HOSTAGE', 'key': 'HostageID',
+        'dependents': [
+            ('HOSTAGE_LOG', 'HostageID', None, None),
+            ('IS_LOCATED_IN', 'h_id', None, None),
+            ('NEGOTIATION', 'Hostageid', None, None),
+        ],
+        'nullify': [],
+    },
+    'phase': {
+        'table': 'PLAN_PHASE', 'key': 'PhaseID',
+        'dependents': [
+            ('ASSIGNED_TO', 'Phase_id', None, None),
+            ('REQUIRES', 'Phase', None, None),
+            ('DEVIATES_FROM', 'P_id', None, None),
+            ('TASK_ASSIGNMENT', 'PID', None, None),
+        ],
+        'nullify': [],
+    },
+}
+
+# Ways to pick many entities at once, beyond an explicit key list
+SELECTORS = {
+    'crew': {
+        'heist': "SELECT CodeName FROM CREW_MEMBER WHERE HeistID = %s",
+    },
+    'hostage': {
+        'blueprint': """
+            SELECT HostageID FROM HOSTAGE WHERE BlueprintID = %s
+            UNION SELECT h_id FROM IS_LOCATED_IN WHERE BPid = %s
+        """,
+        'status': "SELECT HostageID FROM HOSTAGE WHERE Status = %s",
+        'manager': "SELECT HostageID FROM HOSTAGE WHERE ManagerCodename = %s",
+    },
+    'phase': {},
+}
+
+
+def _placeholders(count):
+    return ', '.join(['%s'] * count)
+
+
+def _row_match(columns, rows):
+    """WHERE fragment matching exact rows by their primary key"""
+    if len(columns) == 1:
+        return f"{columns[0]} IN ({_placeholders(len(rows))})", [r[0] for r in rows]
+    row = '(' + _placeholders(len(columns)) + ')'
+    return (f"({', '.join(columns)}) IN ({', '.join([row] * len(rows))})",
+            [v for r in rows for v in r])
+
+
+def _delete_chunk(tx, table, column, keys, archive, touches=None, touch_column=None):
+    """Archive and delete up to CHUNK_SIZE rows of `table` in one short transaction.
+
+    Returns (rows deleted, rows archived, rows found).
+    """
+    pk = PRIMARY_KEYS[table]
+    with tx() as uow:
+        rows = uow.fetch(f"""
+            SELECT {', '.join(pk)} FROM {table}
+            WHERE {column} IN ({_placeholders(len(keys))})
+            LIMIT %s FOR UPDATE
+        """, tuple(keys) + (CHUNK_SIZE,), rows='tuple')
+        if not rows:
+            return 0, 0, 0
+        match, params = _row_match(pk, rows)
+        if archive:
+            uow.execute(f"INSERT INTO ARCHIVE_{table} SELECT NULL, {table}.*, NOW() FROM {table} "
+                        f"WHERE {match}", params)
+        deleted = uow.execute(f"DELETE FROM {table} WHERE {match}", params)
+        if touches:
+            idx = pk.index(touch_column)
+            record_changes(uow, touches, sorted({r[idx] for r in rows}))
+    return deleted, len(rows) if archive else 0, len(rows)
+
+
+def _nullify_chunk(tx, table, column, keys):
+    """Clear an ON DELETE SET NULL reference for up to CHUNK_SIZE rows.
+
+    Returns (rows updated, 0, rows found).
+    """
+    pk = PRIMARY_KEYS[table]
+    with tx() as uow:
+        rows = uow.fetch(f"""
+            SELECT {', '.join(pk)} FROM {table}
+            WHERE {column} IN ({_placeholders(len(keys))})
+            LIMIT %s FOR UPDATE
+        """, tuple(keys) + (CHUNK_SIZE,), rows='tuple')
+        if not rows:
+            return 0, 0, 0
+        match, params = _row_match(pk, rows)
+        updated = uow.execute(f"UPDATE {table} SET {column} = NULL WHERE {match}", params)
+        record_changes(uow, table, [r[0] for r in rows])
+    return updated, 0, len(rows)
+
+
+def _dependent_counts(uow, plan, keys):
+    """Rows each dependent / SET NULL table holds for `keys`, capped at CHUNK_SIZE + 1.
+
+    One UNION ALL query, so empty tables cost nothing later.
+    """
+    targets = [(table, column) for table, column, _, _ in plan['dependents']] + plan['nullify']
+    in_keys = _placeholders(len(keys))
+    parts, params = [], []
+    for table, column in targets:
+        parts.append(f"""
+            SELECT %s, %s, COUNT(*) FROM (
+                SELECT 1 FROM {table} WHERE {column} IN ({in_keys}) LIMIT %s
+            ) AS capped
+        """)
+        params.extend([table, column, *keys, CHUNK_SIZE + 1])
+    rows = uow.fetch(' UNION ALL '.join(parts), tuple(params), rows='tuple')
+    return {(table, column): count for table, column, count in rows}
+
+
+def _lock_and_count(uow, plan, keys):
+    """Lock the parent rows (so no new dependents appear) and count their dependents"""
+    parents = uow.fetch(f"SELECT {plan['key']} FROM {plan['table']} "
+                        f"WHERE {plan['key']} IN ({_placeholders(len(keys))}) FOR UPDATE",
+                        keys, rows='tuple')
+    return parents, _dependent_counts(uow, plan, keys)
+
+
+def _cascade(uow, plan, keys, parents, counts, archive):
+    """Delete entities in one transaction, letting ON DELETE CASCADE / SET NULL do the work"""
+    in_keys = _placeholders(len(keys))
+    counters = {'deleted': 0, 'archived': 0, 'nullified': 0}
+    touched = []
+    for table, column, touches, touch_column in plan['dependents']:
+        count = counts[(table, column)]
+        if not count:
+            continue
+        if archive:
+            counters['archived'] += uow.execute(
+                f"INSERT INTO ARCHIVE_{table} SELECT NULL, {table}.*, NOW() FROM {table} "
+                f"WHERE {column} IN ({in_keys})", keys)
+        if touches:
+            rows = uow.fetch(f"SELECT DISTINCT {touch_column} FROM {table} WHERE {column} IN ({in_keys})",
+                             keys, rows='tuple')
+            touched.append((touches, sorted(r[0] for r in rows)))
+        counters['deleted'] += count
+    for table, column in plan['nullify']:
+        if counts[(table, column)]:
+            rows = uow.fetch(f"SELECT {PRIMARY_KEYS[table][0]} FROM {table} WHERE {column} IN ({in_keys})",
+                             keys, rows='tuple')
+            touched.append((table, [r[0] for r in rows]))
+            counters['nullified'] += len(rows)
+
+    if archive and parents:
+        counters['archived'] += uow.execute(
+            f"INSERT INTO ARCHIVE_{plan['table']} SELECT NULL, {plan['table']}.*, NOW() "
+            f"FROM {plan['table']} WHERE {plan['key']} IN ({in_keys})", keys)
+    counters['deleted'] += uow.execute(
+        f"DELETE FROM {plan['table']} WHERE {plan['key']} IN ({in_keys})", keys)
+    for table, changed in touched:
+        record_changes(uow, table, changed)
+    for r in parents:
+        record_change(uow, plan['table'], r[0], 'delete')
+    return counters
+
+
+def delete_entities(db, entity, keys, archive=False, on_chunk=None):
+    """Delete entities and everything hanging off them.
+
+    Small trees go in one cascading transaction, larger ones chunk by chunk.
+    Returns {'deleted': rows, 'archived': rows, 'nullified': rows}.
+    on_chunk(counters) is called after every chunk for progress reporting.
+    """
+    plan = PLANS[entity]
+    keys = tuple(keys)
+    counters = {'deleted': 0, 'archived': 0, 'nullified': 0}
+    if not keys:
+        return counters
+
+    with db.transactions() as tx:
+        with tx() as uow:
+            parents, counts = _lock_and_count(uow, plan, keys)
+            small = sum(counts.values()) <= CHUNK_SIZE
+            if small:
+                counters = _cascade(uow, plan, keys, parents, counts, archive)
+        if small:
+            if on_chunk:
+                on_chunk(counters)
+            return counters
+
+        def drain(step, counter='deleted'):
+            # Repeat one chunked step until a chunk comes back short
+            while True:
+                affected, archived, found = step()
+                counters[counter] += affected
+                counters['archived'] += archived
+                if on_chunk:
+                    on_chunk(counters)
+                if found < CHUNK_SIZE:
+                    return
+                time.sleep(CHUNK_PAUSE)
+
+        for table, column, touches, touch_column in plan['dependents']:
+            if counts[(table, column)]:
+                drain(lambda: _delete_chunk(tx, table, column, keys, archive, touches, touch_column))
+        for table, column in plan['nullify']:
+            if counts[(table, column)]:
+                drain(lambda: _nullify_chunk(tx, table, column, keys), 'nullified')
+        # Parents last, together with (and archiving) any dependents added
+        # after their table was drained
+        with tx() as uow:
+            parents, counts = _lock_and_count(uow, plan, keys)
+            for name, count in _cascade(uow, plan, keys, parents, counts, archive).items():
+                counters[name] += count
+        if on_chunk:
+            on_chunk(counters)
+    return counters
+
+
+# ----------------------------------------------------------------------
+# Background jobs
+# ----------------------------------------------------------------------
+
+def resolve_keys(db, entity, keys=None, selector=None, value=None):
+    """Entity keys from an explicit list or a named selector"""
+    if entity not in PLANS:
+        raise ValueError(f"Unknown entity {entity!r}, expected one of {', '.join(PLANS)}")
+    if keys is not None:
+        if not isinstance(keys, list) or not all(isinstance(k, (str, int)) and not isinstance(k, bool) for k in keys):
+            raise ValueError("keys must be a list of strings or integers")
+        if keys:
+            return keys
+    if selector not in SELECTORS[entity]:
+        raise ValueError(f"Unknown selector {selector!r} for {entity}")
+    query = SELECTORS[entity][selector]
+    rows = db.execute_query(query, (value,) * query.count('%s'), rows='tuple')
+    return [r[0] for r in rows]
+
+
+def start_job(db, entity, keys, archive=False, description=''):
+    """Record a BULK_JOB and run it in a background thread; returns the job id"""
+    with db.transaction() as uow:
+        uow.execute("""
+            INSERT INTO BULK_JOB (Entity, Description, Archive, TotalEntities, Owner)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (entity, description, archive, len(keys), f"{socket.gethostname()}:{os.getpid()}"))
+        job_id = uow.lastrowid
+    thread = threading.Thread(target=run_job, args=(db, job_id, entity, keys, archive),
+                              name=f'bulk-delete-{job_id}', daemon=True)
+    thread.start()
+    return job_id
+
+
+def _heartbeat(db, job_id, stop):
+    while not stop.wait(HEARTBEAT):
+        try:
+            db.execute_update("UPDATE BULK_JOB SET HeartbeatAt = NOW() WHERE JobID = %s", (job_id,))
+        except Exception:
+            traceback.print_exc()
+
+
+def run_job(db, job_id, entity, keys, archive):
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(db, job_id, stop),
+                     name=f'bulk-delete-{job_id}-heartbeat', daemon=True).start()
+    try:
+        _run_job(db, job_id, entity, keys, archive)
+    finally:
+        stop.set()
+
+
+def _run_job(db, job_id, entity, keys, archive):
+    done = 0
+    totals = {'deleted': 0, 'archived': 0}
+    last_report = [0.0]
+
+    def report(counters, force=False):
+        # Progress writes are throttled so they don't become the bottleneck
+        now = time.monotonic()
+        if force or now - last_report[0] >= 1:
+            last_report[0] = now
+            db.execute_update("""
+                UPDATE BULK_JOB SET DoneEntities = %s, RowsDeleted = %s, RowsArchived = %s
+                WHERE JobID = %s
+            """, (done, totals['deleted'] + counters['deleted'],
+                  totals['archived'] + counters['archived'], job_id))
+
+    try:
+        db.execute_update("UPDATE BULK_JOB SET Status = 'running' WHERE JobID = %s", (job_id,))
+        for start in range(0, len(keys), ENTITY_BATCH):
+            batch = keys[start:start + ENTITY_BATCH]
+            counters = delete_entities(db, entity, batch, archive, on_chunk=report)
+            done += len(batch)
+            totals['deleted'] += counters['deleted']
+            totals['archived'] += counters['archived']
+            report({'deleted': 0, 'archived': 0, 'nullified': 0}, force=True)
+        db.execute_update("UPDATE BULK_JOB SET Status = 'done' WHERE JobID = %s", (job_id,))
+    except Exception as e:
+        traceback.print_exc()
+        db.execute_update("UPDATE BULK_JOB SET Status = 'failed', Error = %s WHERE JobID = %s",
+                          (str(e), job_id))
+
+
+def job_status(db, job_id):
+    # A queued/running job whose worker died never finishes on its own
+    db.execute_update("""
+        UPDATE BULK_JOB
+        SET Status = 'failed', Error = 'Worker stopped before the job finished; submit it again to complete it'
+        WHERE JobID = %s AND Status IN ('queued', 'running')
+          AND HeartbeatAt < NOW() - INTERVAL %s SECOND
+    """, (job_id, STALE_AFTER))
+    rows = db.execute_query("SELECT * FROM BULK_JOB WHERE JobID = %s", (job_id,))
+    return rows[0] if rows else None
@@ -0,0 +1,149 @@
+"""Change feed for delta sync of the main tables.
+
+Every write route records a CHANGE_LOG row in the same transaction as the
+write. Clients keep the last ChangeSeq they saw and ask for everything after
+it, so a sync only transfers rows that actually changed.
+
+ChangeSeq is handed out at insert time but becomes visible at commit, so a
+low sequence number can appear after a higher one. The feed therefore only
+serves log rows written before the oldest still-open writing transaction
+started (from information_schema.INNODB_TRX); anything older has committed
+or rolled back and can't show up behind a client's cursor later.
+"""
+import pymysql
+
+# Synced tables and their primary key column
+SYNCED_TABLES = {
+    'CREW_MEMBER': 'CodeName',
+    'HOSTAGE': 'HostageID',
+    'RESOURCE': 'ResourceID',
+    'PLAN_PHASE': 'PhaseID',
+}
+
+# Fallback hold-back when the app's MySQL user can't read INNODB_TRX
+# (needs the PROCESS privilege)
+SETTLE_SECONDS = 2
+
+
+def record_change(uow, table, key, operation='upsert'):
+    """Log a change inside a unit of work and stamp the row's RowVersion"""
+    if operation == 'upsert':
+        # Any lock wait happens here, before the log row takes its ChangeSeq
+        lock_row(uow, table, key)
+    uow.execute("""
+        INSERT INTO CHANGE_LOG (TableName, RowKey, Operation) VALUES (%s, %s, %s)
+    """, (table, str(key), operation))
+    seq = uow.lastrowid
+    if operation == 'upsert':
+        uow.execute(f"UPDATE {table} SET RowVersion = %s WHERE {SYNCED_TABLES[table]} = %s",
+                    (seq, key))
+    return seq
+
+
+def lock_row(uow, table, key):
+    """Take a synced row's exclusive lock up front.
+
+    Call before inserting children of the row: their FK check share-locks it,
+    and two transactions both holding that shared lock deadlock when
+    record_change then needs the exclusive one.
+    """
+    return uow.fetch(f"SELECT {SYNCED_TABLES[table]} FROM {table} WHERE {SYNCED_TABLES[table]} = %s FOR UPDATE",
+                     (key,))
+
+
+def record_changes(uow, table, keys, operation='upsert'):
+    """Log the same kind of change for several rows"""
+    for key in keys:
+        record_change(uow, table, key, operation)
+
+
+def seed_change_log(db):
+    """Log every synced row that has never been logged (RowVersion = 0).
+
+    Rows loaded by populate.sql or written before the feed existed have no
+    CHANGE_LOG entry, so a since=0 sync would never see them. Safe to re-run:
+    seeded rows get their RowVersion stamped and are skipped next time.
+    """
+    seeded = {}
+    with db.transaction() as uow:
+        for table, pk in SYNCED_TABLES.items():
+            seeded[table] = uow.execute(f"""
+                INSERT INTO CHANGE_LOG (TableName, RowKey, Operation)
+                SELECT %s, {pk}, 'upsert' FROM {table} WHERE RowVersion = 0 ORDER BY {pk}
+            """, (table,))
+            uow.execute(f"""
+                UPDATE {table} t
+                JOIN (SELECT RowKey, MAX(ChangeSeq) AS seq FROM CHANGE_LOG
+                      WHERE TableName = %s GROUP BY RowKey) c
+                  ON c.RowKey = CAST(t.{pk} AS CHAR)
+                SET t.RowVersion = c.seq
+                WHERE t.RowVersion = 0
+            """, (table,))
+    return seeded
+
+
+def safe_point(db):
+    """Server time before which every CHANGE_LOG row is committed or gone"""
+    try:
+        rows = db.execute_query("""
+            SELECT COALESCE(MIN(trx_started), NOW(3)) AS safe
+            FROM information_schema.INNODB_TRX
+            WHERE trx_rows_modified > 0 AND trx_mysql_thread_id <> CONNECTION_ID()
+        """)
+    except pymysql.OperationalError as e:
+        if e.args[0] != 1227:   # access denied: no PROCESS privilege
+            raise
+        rows = db.execute_query(
+            f"SELECT NOW(3) - INTERVAL {SETTLE_SECONDS} SECOND AS safe")
+    return rows[0]['safe']
+
+
+def read_changes(db, since, limit):
+    """Changes after the `since` cursor, newest state per row.
+
+    Returns (changes, cursor, has_more). Each change is a dict with seq,
+    table, key, op and, for upserts, the row as it is now.
+    """
+    log = db.execute_query("""
+        SELECT ChangeSeq, TableName, RowKey, Operation
+        FROM CHANGE_LOG
+        WHERE ChangeSeq > %s AND ChangedAt < %s
+        ORDER BY ChangeSeq
+        LIMIT %s
+    """, (since, safe_point(db), limit + 1))
+
+    has_more = len(log) > limit
+    log = log[:limit]
+    cursor = log[-1]['ChangeSeq'] if log else since
+
+    # Collapse repeated changes to one row within the page, keeping the latest
+    latest = {}
+    for entry in log:
+        latest[(entry['TableName'], entry['RowKey'])] = entry
+
+    # Fetch current rows one query per table
+    wanted = {}
+    for (table, key), entry in latest.items():
+        if entry['Operation'] == 'upsert' and table in SYNCED_TABLES:
+            wanted.setdefault(table, []).append(key)
+    rows = {}
+    for table, keys in wanted.items():
+        pk = SYNCED_TABLES[table]
+        placeholders = ', '.join(['%s'] * len(keys))
+        for row in db.execute_query(
+                f"SELECT * FROM {table} WHERE {pk} IN ({placeholders})", tuple(keys)):
+            rows[(table, str(row[pk]))] = row
+
+    changes = []
+    for (table, key), entry in sorted(latest.items(), key=lambda kv: kv[1]['ChangeSeq']):
+        change = {'seq': entry['ChangeSeq'], 'table': table, 'key': key, 'op': entry['Operation']}
+        if entry['Operation'] == 'upsert':
+            row = rows.get((table, key))
+            if row is None:
+                # Deleted after this page's change; a tombstone follows later
+                change['op'] = 'delete'
+            else:
+                change['row'] = row
+        changes.append(change)
+
+    return changes, cursor, has_more
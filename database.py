@@ -1,26 +1,193 @@
 import pymysql
+import sqlite3
 import os
+import itertools
+from collections import namedtuple
+from functools import lru_cache
+from snapshot import SnapshotReader
+import threading
+import time
 from contextlib import contextmanager
 
+
+def parse_dsn(dsn, default_port=3306):
+    """Split a 'host' or 'host:port' string into (host, port)"""
+    dsn = dsn.strip()
+    if ':' in dsn:
+        host, port = dsn.rsplit(':', 1)
+        return host, int(port)
+    return dsn, default_port
+
+
+# Row modes for fetches. 'dict' is a dict per row (DictCursor); the others
+# avoid repeating the column names in every row:
+#   'tuple'    - TupleRows: a list of plain tuples with a shared .columns header
+#   'record'   - namedtuple rows (attribute access, no per-row __dict__)
+#   'columnar' - {column: [values...]}, one list per column
+ROW_MODES = ('dict', 'tuple', 'record', 'columnar')
+
+
+class TupleRows(list):
+    """List of row tuples plus the column names they share"""
+    def __init__(self, rows, columns):
+        super().__init__(rows)
+        self.columns = columns
+
+
+@lru_cache(maxsize=256)
+def record_type(columns):
+    """namedtuple class for a column list, cached so repeated queries reuse it"""
+    return namedtuple('Record', columns, rename=True)
+
+
+def shape_rows(rows, columns, mode):
+    """Turn raw row tuples into the requested row mode"""
+    if mode == 'dict':
+        return [dict(zip(columns, row)) for row in rows]
+    if mode == 'tuple':
+        return TupleRows(rows, columns)
+    if mode == 'record':
+        make = record_type(columns)._make
+        return [make(row) for row in rows]
+    if mode == 'columnar':
+        if not rows:
+            return {c: [] for c in columns}
+        return dict(zip(columns, map(list, zip(*rows))))
+    raise ValueError(f"Unknown row mode {mode!r}, expected one of {ROW_MODES}")
+
+
+def fetch_rows(conn, query, params, rows='dict'):
+    """Run a SELECT on an open connection and return rows in the given mode"""
+    if rows == 'dict':
+        with conn.cursor() as cursor:
+            cursor.execute(query, params or ())
+            return cursor.fetchall()
+    # Compact modes read plain tuples instead of building a dict per row
+    with conn.cursor(pymysql.cursors.Cursor) as cursor:
+        cursor.execute(query, params or ())
+        columns = tuple(d[0] for d in cursor.description)
+        return shape_rows(cursor.fetchall(), columns, rows)
+
+
+# OperationalError codes meaning the server can't be reached or won't take connections
+MYSQL_UNAVAILABLE = {1040, 1203, 2002, 2003, 2006, 2013}
+
+
+class ReadOnlyError(Exception):
+    """Raised for writes while the app is serving from a snapshot"""
+
+
+class SnapshotQueryError(Exception):
+    """Raised for a read the offline snapshot can't answer (MySQL-only SQL)"""
+
+
+class Replica:
+    """Health and lag bookkeeping for a single read replica"""
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.healthy = True
+        self.lag = None
+        self.last_checked = 0.0
+
+    def __repr__(self):
+        return f"Replica({self.host}:{self.port}, healthy={self.healthy}, lag={self.lag})"
+
+
+class UnitOfWork:
+    """Statements run on one primary connection and committed together"""
+    def __init__(self, connection):
+        self.connection = connection
+        self.lastrowid = None
+
+    def execute(self, query, params=None):
+        """Execute a statement and return the affected row count"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(query, params or ())
+            self.lastrowid = cursor.lastrowid
+            return cursor.rowcount
+
+    def execute_many(self, query, param_list):
+        """Execute one statement for every parameter tuple in a single batch"""
+        if not param_list:
+            return 0
+        with self.connection.cursor() as cursor:
+            return cursor.executemany(query, param_list)
+
+    def fetch(self, query, params=None, rows='dict'):
+        """Run a SELECT inside the transaction (sees its own uncommitted writes)"""
+        return fetch_rows(self.connection, query, params, rows)
+
+    def insert_ignore(self, table, columns, rows):
+        """Insert rows, silently skipping ones whose key already exists.
+
+        Uses ON DUPLICATE KEY UPDATE instead of INSERT IGNORE so foreign key
+        and CHECK violations still raise. Returns the number of new rows.
+        """
+        if not rows:
+            return 0
+        cols = ', '.join(columns)
+        placeholders = ', '.join(['%s'] * len(columns))
+        query = (f"INSERT INTO {table} ({cols}) VALUES ({placeholders}) "
+                 f"ON DUPLICATE KEY UPDATE {columns[0]} = {columns[0]}")
+        # A no-op duplicate reports 0 affected rows, a fresh insert reports 1
+        return self.execute_many(query, [tuple(r) for r in rows])
+
+
 class Database:
-    def __init__(self, host='localhost', user='root', password='', database='bellaciao_db'):
+    def __init__(self, host='localhost', user='root', password='', database='bellaciao_db',
+                 port=3306, replicas=None, max_replica_lag=5, lag_check_interval=10,
+                 read_after_write_window=None, snapshot_path=None, snapshot_mode='off',
+                 connect_timeout=3, outage_cooldown=30):
         self.host = host
+        self.port = port
         self.user = user
         self.password = password
         self.database = database
-    
+        self.connect_timeout = connect_timeout
+
+        # Read replicas: list of 'host' or 'host:port' strings
+        self.replicas = [Replica(*parse_dsn(r)) for r in (replicas or []) if r.strip()]
+        self.max_replica_lag = max_replica_lag
+        self.lag_check_interval = lag_check_interval
+        # A replica counted as healthy can be up to max_replica_lag behind, so
+        # reads after a write stay on the primary at least that long
+        self.read_after_write_window = max(read_after_write_window or 0, max_replica_lag)
+        self._replica_cycle = itertools.cycle(self.replicas) if self.replicas else None
+        self._replica_lock = threading.Lock()
+        self._local = threading.local()
+
+        # Snapshot serving: 'off', 'fallback' (when MySQL is unreachable) or
+        # 'readonly' (every read from the snapshot, writes refused)
+        if snapshot_mode not in ('off', 'fallback', 'readonly'):
+            raise ValueError(f"Unknown snapshot mode {snapshot_mode!r}")
+        if snapshot_mode != 'off' and not snapshot_path:
+            raise ValueError("snapshot_mode needs a snapshot_path")
+        self.snapshot_mode = snapshot_mode
+        self.snapshot = SnapshotReader(snapshot_path) if snapshot_path else None
+
+        # Fallback circuit breaker: after MySQL fails, reads go straight to the
+        # snapshot until `outage_cooldown` has passed, then one read probes again
+        self.outage_cooldown = outage_cooldown
+        self._mysql_down_until = 0.0
+        self._outage_lock = threading.Lock()
+
     @contextmanager
-    def get_connection(self):
-        """Context manager for database connections"""
+    def get_connection(self, host=None, port=None):
+        """Context manager for database connections (primary unless host is given)"""
+        if self.snapshot_mode == 'readonly':
+            raise ReadOnlyError("Database is in read-only snapshot mode")
         connection = None
         try:
             connection = pymysql.connect(
-                host=self.host,
+                host=host or self.host,
+                port=port or self.port,
                 user=self.user,
                 password=self.password,
                 database=self.database,
                 cursorclass=pymysql.cursors.DictCursor,
-                autocommit=False
+                autocommit=False,
+                connect_timeout=self.connect_timeout
             )
             yield connection
         except pymysql.Error as e:
@@ -31,26 +198,224 @@ class Database:
         finally:
             if connection:
                 connection.close()
-    
-    def execute_query(self, query, params=None, fetch=True):
-        """Execute a query and return results"""
+
+    # ------------------------------------------------------------------
+    # Replica routing
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def primary(self):
+        """Pin every query in this block to the primary (read-your-writes)"""
+        depth = getattr(self._local, 'pinned', 0)
+        self._local.pinned = depth + 1
+        try:
+            yield self
+        finally:
+            self._local.pinned = depth
+
+    def begin_request(self, last_write=0.0):
+        """Reset per-request state; last_write is the caller's last write time (time.time())
+
+        The web app keeps last_write in the user's session, so the redirected
+        GET after a POST stays on the primary whichever thread or worker serves it.
+        """
+        self._local.last_write = last_write
+        self._local.request_wrote = False
+        self._local.used_snapshot = False
+
+    def last_write(self):
+        """Time of this request's latest write, or None if it didn't write"""
+        if getattr(self._local, 'request_wrote', False):
+            return self._local.last_write
+        return None
+
+    def _mark_write(self):
+        self._local.last_write = time.time()
+        self._local.request_wrote = True
+
+    def _pinned_to_primary(self):
+        if getattr(self._local, 'pinned', 0):
+            return True
+        # Reads issued soon after a write stay on the primary
+        last_write = getattr(self._local, 'last_write', 0.0)
+        return time.time() - last_write < self.read_after_write_window
+
+    def _check_replica(self, replica):
+        """Refresh a replica's health from its replication status"""
+        replica.last_checked = time.monotonic()
+        try:
+            with self.get_connection(replica.host, replica.port) as conn:
+                with conn.cursor() as cursor:
+                    try:
+                        cursor.execute("SHOW REPLICA STATUS")
+                    except pymysql.Error:
+                        # MySQL < 8.0.22
+                        cursor.execute("SHOW SLAVE STATUS")
+                    status = cursor.fetchone()
+        except pymysql.Error:
+            replica.healthy = False
+            replica.lag = None
+            return
+
+        if not status:
+            # Not configured as a replica: treat as an in-sync read target
+            replica.lag = 0
+        else:
+            replica.lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        replica.healthy = replica.lag is not None and replica.lag <= self.max_replica_lag
+
+    def _pick_replica(self):
+        """Round-robin over healthy replicas; None means fall back to the primary"""
+        if not self.replicas:
+            return None
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            with self._replica_lock:
+                replica = next(self._replica_cycle)
+            # Unhealthy replicas are re-checked on the same interval so they fail back in
+            if now - replica.last_checked >= self.lag_check_interval:
+                self._check_replica(replica)
+            if replica.healthy:
+                return replica
+        return None
+
+    def replica_status(self):
+        """Current view of the replica pool"""
+        return [{'host': r.host, 'port': r.port, 'healthy': r.healthy, 'lag': r.lag}
+                for r in self.replicas]
+
+    # ------------------------------------------------------------------
+    # Snapshot serving
+    # ------------------------------------------------------------------
+
+    def _snapshot_read(self, query, params, rows):
+        self._local.used_snapshot = True
+        try:
+            columns, data = self.snapshot.execute(query, params)
+        except sqlite3.Error as e:
+            raise SnapshotQueryError(f"Not available from the offline snapshot: {e}") from e
+        return shape_rows(data, columns, rows)
+
+    def serving_snapshot(self):
+        """True while reads are being answered from the snapshot instead of MySQL"""
+        return (self.snapshot_mode == 'readonly'
+                or (self.snapshot_mode == 'fallback' and time.monotonic() < self._mysql_down_until))
+
+    def used_snapshot(self):
+        """Whether a read in this request was answered from the snapshot"""
+        return getattr(self._local, 'used_snapshot', False)
+
+    def snapshot_status(self):
+        status = {'mode': self.snapshot_mode, 'path': self.snapshot.path if self.snapshot else None,
+                  'created_at': None,
+                  'mysql_down_for': max(0.0, round(self._mysql_down_until - time.monotonic(), 1))}
+        if self.snapshot:
+            try:
+                status['created_at'] = self.snapshot.created_at()
+            except Exception as e:
+                status['error'] = str(e)
+        return status
+
+    def _mysql_available(self):
+        """False while the breaker is open; once it expires, one caller gets to probe"""
+        with self._outage_lock:
+            now = time.monotonic()
+            if now < self._mysql_down_until:
+                return False
+            if self._mysql_down_until:
+                # Half-open: hold everyone else on the snapshot while this read probes
+                self._mysql_down_until = now + self.outage_cooldown
+            return True
+
+    def _execute_read(self, query, params, rows):
+        if self.snapshot_mode == 'readonly':
+            return self._snapshot_read(query, params, rows)
+        if self.snapshot_mode != 'fallback':
+            return self._execute_mysql_read(query, params, rows)
+        if not self._mysql_available():
+            return self._snapshot_read(query, params, rows)
+        try:
+            return self._execute_mysql_read(query, params, rows)
+        except pymysql.OperationalError as e:
+            if not e.args or e.args[0] in MYSQL_UNAVAILABLE:
+                with self._outage_lock:
+                    self._mysql_down_until = time.monotonic() + self.outage_cooldown
+                print(f"Database unavailable, answering from snapshot for {self.outage_cooldown}s")
+                return self._snapshot_read(query, params, rows)
+            self._mysql_answered()
+            raise
+        except Exception:
+            # Any other error came back from a live server
+            self._mysql_answered()
+            raise
+        else:
+            self._mysql_answered()
+
+    def _mysql_answered(self):
+        if self._mysql_down_until:
+            with self._outage_lock:
+                self._mysql_down_until = 0.0
+
+    def _execute_mysql_read(self, query, params, rows):
+        if not self._pinned_to_primary():
+            replica = self._pick_replica()
+            if replica:
+                try:
+                    with self.get_connection(replica.host, replica.port) as conn:
+                        return fetch_rows(conn, query, params, rows)
+                except pymysql.OperationalError:
+                    # Connection-level failure: drop it from rotation and retry on primary
+                    replica.healthy = False
+                    replica.last_checked = time.monotonic()
+        with self.get_connection() as conn:
+            return fetch_rows(conn, query, params, rows)
+
+    @contextmanager
+    def transaction(self):
+        """Unit of work: one primary connection, one commit, rollback on any error"""
+        with self.get_connection() as conn:
+            with self._unit_of_work(conn) as uow:
+                yield uow
+
+    @contextmanager
+    def transactions(self):
+        """One primary connection for a series of short units of work.
+
+        Yields a factory: each `with tx() as uow:` block commits on its own.
+        """
+        with self.get_connection() as conn:
+            yield lambda: self._unit_of_work(conn)
+
+    @contextmanager
+    def _unit_of_work(self, conn):
+        try:
+            yield UnitOfWork(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._mark_write()
+
+    def execute_query(self, query, params=None, fetch=True, rows='dict'):
+        """Execute a query and return results (rows picks the row mode, see ROW_MODES)"""
+        if fetch:
+            return self._execute_read(query, params, rows)
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(query, params or ())
-                if fetch:
-                    return cursor.fetchall()
-                else:
-                    conn.commit()
-                    return cursor.rowcount
-    
+                conn.commit()
+                self._mark_write()
+                return cursor.rowcount
+
     def execute_insert(self, query, params=None):
         """Execute an insert query"""
         return self.execute_query(query, params, fetch=False)
-    
+
     def execute_update(self, query, params=None):
         """Execute an update query"""
         return self.execute_query(query, params, fetch=False)
-    
+
     def execute_delete(self, query, params=None):
         """Execute a delete query"""
         return self.execute_query(query, params, fetch=False)
@@ -0,0 +1,154 @@
+"""Faceted hostage filtering.
+
+Filters: status, usefulness range, instigator flag, manager and location.
+Facet counts follow the usual drill-down rule: each dimension is counted
+with every *other* active filter applied, so ticking a status box doesn't
+zero out the other statuses. All five facets come back from one UNION ALL
+query; the result page is a second query.
+"""
+
+STATUSES = ['Cooperative', 'Neutral', 'Resistant', 'Hostile']
+UNASSIGNED = ''  # manager facet value for hostages without a manager
+PAGE_SIZE = 200
+
+BASE_FROM = """
+    FROM HOSTAGE h
+    LEFT JOIN IS_LOCATED_IN il ON h.HostageID = il.h_id
+    LEFT JOIN HEIST_BLUEPRINT hb ON il.BPid = hb.BlueprintID
+"""
+
+# facet name: SQL expression it groups by
+FACET_COLUMNS = {
+    'status': 'h.Status',
+    'usefulness': 'h.Usefulness',
+    'instigator': 'h.InstigatorFlag',
+    'manager': 'h.ManagerCodename',
+    'location': 'il.BPid',
+}
+
+
+def parse_filters(args):
+    """Read filter values from request args (multi-valued where it makes sense)"""
+    def to_int(name):
+        try:
+            return int(args.get(name, '').strip())
+        except ValueError:
+            return None
+
+    instigator = args.get('instigator', '').strip()
+    return {
+        'status': [s for s in args.getlist('status') if s in STATUSES],
+        'min_usefulness': to_int('min_usefulness'),
+        'max_usefulness': to_int('max_usefulness'),
+        'instigator': {'1': True, '0': False}.get(instigator),
+        'manager': args.getlist('manager'),
+        'location': [int(b) for b in args.getlist('location') if b.isascii() and b.isdigit()],
+    }
+
+
+def _in_clause(column, values):
+    return f"{column} IN ({', '.join(['%s'] * len(values))})", list(values)
+
+
+def _clauses(filters):
+    """WHERE fragments keyed by the facet they belong to"""
+    clauses = {}
+    if filters['status']:
+        clauses['status'] = _in_clause('h.Status', filters['status'])
+    lo, hi = filters['min_usefulness'], filters['max_usefulness']
+    if lo is not None or hi is not None:
+        clauses['usefulness'] = ("h.Usefulness BETWEEN %s AND %s",
+                                 [lo if lo is not None else 0, hi if hi is not None else 10])
+    if filters['instigator'] is not None:
+        clauses['instigator'] = ("h.InstigatorFlag = %s", [filters['instigator']])
+    if filters['manager']:
+        named = [m for m in filters['manager'] if m != UNASSIGNED]
+        parts, params = [], []
+        if named:
+            sql, params = _in_clause('h.ManagerCodename', named)
+            parts.append(sql)
+        if UNASSIGNED in filters['manager']:
+            parts.append('h.ManagerCodename IS NULL')
+        clauses['manager'] = ('(' + ' OR '.join(parts) + ')', params)
+    if filters['location']:
+        clauses['location'] = _in_clause('il.BPid', filters['location'])
+    return clauses
+
+
+def _where(clauses, skip=None):
+    sql, params = [], []
+    for facet, (clause, clause_params) in clauses.items():
+        if facet != skip:
+            sql.append(clause)
+            params.extend(clause_params)
+    return (' WHERE ' + ' AND '.join(sql)) if sql else '', params
+
+
+def facet_counts(db, filters):
+    """Counts for every facet value in a single query"""
+    clauses = _clauses(filters)
+    parts, params = [], []
+    for facet, column in FACET_COLUMNS.items():
+        where, where_params = _where(clauses, skip=facet)
+        label = 'MAX(hb.LocationName)' if facet == 'location' else 'NULL'
+        parts.append(f"""
+            SELECT '{facet}' AS facet, CAST({column} AS CHAR) AS value, {label} AS label,
+                   COUNT(DISTINCT h.HostageID) AS count
+            {BASE_FROM}{where}
+            GROUP BY {column}
+        """)
+        params.extend(where_params)
+    rows = db.execute_query(' UNION ALL '.join(parts), tuple(params))
+
+    counts = {facet: {} for facet in FACET_COLUMNS}
+    labels = {}
+    for row in rows:
+        value = row['value'] if row['value'] is not None else UNASSIGNED
+        counts[row['facet']][value] = row['count']
+        if row['label']:
+            labels[value] = row['label']
+
+    # Fixed-domain facets list every value, even at zero
+    return {
+        'status': [{'value': s, 'label': s, 'count': counts['status'].get(s, 0)} for s in STATUSES],
+        'usefulness': [{'value': u, 'label': str(u), 'count': counts['usefulness'].get(str(u), 0)}
+                       for u in range(11)],
+        'instigator': [{'value': '1', 'label': 'Instigator', 'count': counts['instigator'].get('1', 0)},
+                       {'value': '0', 'label': 'Not instigator', 'count': counts['instigator'].get('0', 0)}],
+        'manager': sorted(
+            [{'value': m, 'label': m or 'Unassigned', 'count': c} for m, c in counts['manager'].items()],
+            key=lambda f: (f['value'] == UNASSIGNED, f['value'])),
+        'location': sorted(
+            [{'value': int(b), 'label': labels.get(b, f'Blueprint {b}'), 'count': c}
+             for b, c in counts['location'].items() if b != UNASSIGNED],
+            key=lambda f: f['label']),
+    }
+
+
+def filter_hostages(db, filters, page=1, rows='dict'):
+    """One page of matching hostages plus facet counts and the total match count"""
+    clauses = _clauses(filters)
+    where, params = _where(clauses)
+    # Page over distinct hostages (the location join can repeat one), then
+    # label each with all its locations
+    hostages = db.execute_query(f"""
+        SELECT h.*, GROUP_CONCAT(DISTINCT hb.LocationName) AS LocationName
+        FROM (
+            SELECT DISTINCT h.HostageID, h.Usefulness
+            {BASE_FROM}{where}
+            ORDER BY h.Usefulness DESC, h.HostageID
+            LIMIT %s OFFSET %s
+        ) page
+        JOIN HOSTAGE h ON h.HostageID = page.HostageID
+        LEFT JOIN IS_LOCATED_IN il ON h.HostageID = il.h_id
+        LEFT JOIN HEIST_BLUEPRINT hb ON il.BPid = hb.BlueprintID
+        GROUP BY h.HostageID
+        ORDER BY h.Usefulness DESC, h.HostageID
+    """, tuple(params) + (PAGE_SIZE, (page - 1) * PAGE_SIZE), rows=rows)
+
+    facets = facet_counts(db, filters)
+    # The status facet ignores only the status filter, so summing the selected
+    # statuses gives the full match count without another query
+    total = sum(f['count'] for f in facets['status']
+                if not filters['status'] or f['value'] in filters['status'])
+    return hostages, facets, total
@@ -0,0 +1,131 @@
+"""Time-series history for loyalty scores and resource levels.
+
+Writes append one raw sample and bump the minute/hour/day rollup buckets in
+the same transaction (two extra statements on an already-open connection).
+Chart queries only read METRIC_ROLLUP, never the raw samples.
+"""
+import math
+from datetime import datetime, timedelta
+
+# Metrics and the entity they are keyed by
+METRICS = {
+    'loyalty': 'CREW_MEMBER.CodeName',
+    'resource_quantity': 'RESOURCE.ResourceID',
+}
+
+# Rollup resolutions: bucket width in seconds and MySQL format to floor a timestamp
+RESOLUTIONS = {
+    'minute': (60, '%Y-%m-%d %H:%i:00'),
+    'hour': (3600, '%Y-%m-%d %H:00:00'),
+    'day': (86400, '%Y-%m-%d 00:00:00'),
+}
+
+# How long each tier is kept (None = forever)
+RETENTION = {
+    'raw': timedelta(days=7),
+    'minute': timedelta(days=2),
+    'hour': timedelta(days=90),
+    'day': None,
+}
+
+
+def record_metric(uow, metric, key, value):
+    """Append a sample and update its rollups inside a unit of work"""
+    uow.execute("""
+        INSERT INTO METRIC_SAMPLE (Metric, EntityKey, Value) VALUES (%s, %s, %s)
+    """, (metric, str(key), value))
+
+    # One multi-row upsert bumps the minute, hour and day buckets together
+    rows = ', '.join(['(%s, %s, %s, DATE_FORMAT(NOW(), %s), %s, %s, %s, 1, %s)'] * len(RESOLUTIONS))
+    params = []
+    for name, (_, fmt) in RESOLUTIONS.items():
+        params.extend([metric, str(key), name, fmt, value, value, value, value])
+    uow.execute(f"""
+        INSERT INTO METRIC_ROLLUP
+            (Metric, EntityKey, Resolution, BucketStart, MinValue, MaxValue, SumValue, SampleCount, LastValue)
+        VALUES {rows}
+        ON DUPLICATE KEY UPDATE
+            MinValue = LEAST(MinValue, VALUES(MinValue)),
+            MaxValue = GREATEST(MaxValue, VALUES(MaxValue)),
+            SumValue = SumValue + VALUES(SumValue),
+            SampleCount = SampleCount + 1,
+            LastValue = VALUES(LastValue)
+    """, tuple(params))
+
+
+def pick_resolution(start, end, points, now=None):
+    """Finest resolution that keeps the range within `points` buckets and still has data for `start`"""
+    now = now or datetime.now()
+    span = (end - start).total_seconds()
+    for name, (width, _) in RESOLUTIONS.items():
+        if RETENTION[name] is not None and start < now - RETENTION[name]:
+            continue   # already purged this far back
+        if span / width <= points:
+            return name
+    return 'day'
+
+
+def bucket_floor(resolution, t):
+    """Start of the rollup bucket containing `t` (same flooring as DATE_FORMAT in record_metric)"""
+    fmt = RESOLUTIONS[resolution][1].replace('%i', '%M')
+    return datetime.strptime(t.strftime(fmt), '%Y-%m-%d %H:%M:%S')
+
+
+def query_metric(db, metric, key, start, end, points=500, resolution=None):
+    """Downsampled series for a chart, read only from pre-aggregated rollups.
+
+    When the chosen resolution still yields more than `points` buckets, they
+    are merged into wider groups so the response never exceeds it. Retention
+    caps how many rollups a tier holds, so the merge is done here rather than
+    in MySQL-only SQL, which keeps the query runnable against a snapshot.
+    Returns (rows, resolution).
+    """
+    resolution = resolution or pick_resolution(start, end, points)
+    width = RESOLUTIONS[resolution][0]
+    span = max((end - start).total_seconds(), width)
+    step = max(1, math.ceil(span / width / points)) * width
+
+    # Groups are counted from the first bucket in local time, like BucketStart
+    origin = bucket_floor(resolution, start)
+    group = timedelta(seconds=step)
+    buckets = db.execute_query("""
+        SELECT BucketStart, MinValue, MaxValue, SumValue, SampleCount, LastValue
+        FROM METRIC_ROLLUP
+        WHERE Metric = %s AND EntityKey = %s AND Resolution = %s
+          AND BucketStart BETWEEN %s AND %s
+        ORDER BY BucketStart
+    """, (metric, str(key), resolution, origin, end), rows='tuple')
+
+    rows = []
+    for bucket_start, lo, hi, total, count, last in buckets:
+        t = origin + (bucket_start - origin) // group * group
+        if not rows or rows[-1]['t'] != t:
+            rows.append({'t': t, 'min': lo, 'max': hi, 'sum': 0, 'count': 0})
+        row = rows[-1]
+        row['min'] = min(row['min'], lo)
+        row['max'] = max(row['max'], hi)
+        row['sum'] += total
+        row['count'] += count
+        row['last'] = last   # buckets arrive in time order
+    for row in rows:
+        row['avg'] = row.pop('sum') / row.pop('count')
+    return rows, resolution
+
+
+def apply_retention(db, batch_size=5000):
+    """Delete samples and rollups past their retention, in small batches"""
+    deleted = 0
+    now = datetime.now()
+    targets = [("DELETE FROM METRIC_SAMPLE WHERE RecordedAt < %s LIMIT %s", 'raw', ())]
+    targets += [("DELETE FROM METRIC_ROLLUP WHERE Resolution = %s AND BucketStart < %s LIMIT %s",
+                 name, (name,)) for name in RESOLUTIONS]
+    for query, tier, prefix in targets:
+        if RETENTION[tier] is None:
+            continue
+        cutoff = now - RETENTION[tier]
+        while True:
+            count = db.execute_delete(query, prefix + (cutoff, batch_size))
+            deleted += count
+            if count < batch_size:
+                break
+    return deleted
@@ -254,6 +254,29 @@ INSERT INTO TASK_ASSIGNMENT (PID, CName, ResID, BID) VALUES
 (7, 'Berlin', 1, 1),
 (7, 'Professor', 7, 1);
 
+-- =====================================================
+-- Seed the change feed so a since=0 sync returns the rows above
+-- (existing databases: flask --app app changefeed-seed)
+-- =====================================================
+
+INSERT INTO CHANGE_LOG (TableName, RowKey, Operation)
+SELECT 'CREW_MEMBER', CodeName, 'upsert' FROM CREW_MEMBER WHERE RowVersion = 0 ORDER BY CodeName;
+INSERT INTO CHANGE_LOG (TableName, RowKey, Operation)
+SELECT 'HOSTAGE', HostageID, 'upsert' FROM HOSTAGE WHERE RowVersion = 0 ORDER BY HostageID;
+INSERT INTO CHANGE_LOG (TableName, RowKey, Operation)
+SELECT 'RESOURCE', ResourceID, 'upsert' FROM RESOURCE WHERE RowVersion = 0 ORDER BY ResourceID;
+INSERT INTO CHANGE_LOG (TableName, RowKey, Operation)
+SELECT 'PLAN_PHASE', PhaseID, 'upsert' FROM PLAN_PHASE WHERE RowVersion = 0 ORDER BY PhaseID;
+
+UPDATE CREW_MEMBER t JOIN CHANGE_LOG c ON c.TableName = 'CREW_MEMBER' AND c.RowKey = t.CodeName
+SET t.RowVersion = c.ChangeSeq WHERE t.RowVersion = 0;
+UPDATE HOSTAGE t JOIN CHANGE_LOG c ON c.TableName = 'HOSTAGE' AND c.RowKey = CAST(t.HostageID AS CHAR)
+SET t.RowVersion = c.ChangeSeq WHERE t.RowVersion = 0;
+UPDATE RESOURCE t JOIN CHANGE_LOG c ON c.TableName = 'RESOURCE' AND c.RowKey = CAST(t.ResourceID AS CHAR)
+SET t.RowVersion = c.ChangeSeq WHERE t.RowVersion = 0;
+UPDATE PLAN_PHASE t JOIN CHANGE_LOG c ON c.TableName = 'PLAN_PHASE' AND c.RowKey = CAST(t.PhaseID AS CHAR)
+SET t.RowVersion = c.ChangeSeq WHERE t.RowVersion = 0;
+
 -- =====================================================
 -- End of Data Population
 -- =====================================================
\ No newline at end of file
@@ -0,0 +1,193 @@
+"""Low-overhead sampling profiler for Flask routes.
+
+A background thread wakes every `interval` seconds and records the current
+stack of each thread that is serving a profiled request. Nothing is traced
+per call, so profiled requests pay only for the periodic stack walk and
+unprofiled requests pay nothing beyond a set lookup.
+
+A request is profiled when:
+  - its endpoint has been switched on (PROFILE_ROUTES or the admin endpoint),
+  - it carries an `X-Profile: <token>` header, or
+  - it wins the random draw at `sample_rate` (e.g. 0.01 = 1% of requests).
+
+Stacks are aggregated per route and exported as collapsed stacks (one
+`route;frame;frame count` line each, the input format of flamegraph.pl and
+speedscope) plus a top-N hotspot report that splits time into SQL (pymysql),
+template rendering (jinja2) and Python.
+
+Each gunicorn worker process keeps its own aggregate; the sampler thread is
+started lazily so it is created after the fork.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+MAX_DEPTH = 64
+MAX_STACKS = 20000   # distinct stacks kept before new ones are lumped together
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)})"
+
+
+def _category(frames):
+    """Where a sample was spent, judged from the leaf upwards"""
+    for code in frames:
+        path = code.co_filename
+        if 'pymysql' in path:
+            return 'sql'
+        if 'jinja2' in path or path.endswith('.html'):
+            return 'template'
+    return 'python'
+
+
+class SamplingProfiler:
+    def __init__(self, app=None, interval=0.01, sample_rate=0.0, routes=None, token=None):
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.routes = set(routes or [])
+        self.token = token
+        self.stacks = Counter()       # (route, collapsed stack) -> samples
+        self.hotspots = Counter()     # (route, file:line function) -> samples at the leaf
+        self.categories = Counter()   # (route, category) -> samples
+        self.requests = Counter()     # route -> profiled requests
+        self._active = {}             # thread id -> route
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    # ------------------------------------------------------------------
+    # Request hooks
+    # ------------------------------------------------------------------
+
+    def should_profile(self, endpoint, header):
+        if endpoint in self.routes:
+            return True
+        if header and self.token and header == self.token:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _before_request(self):
+        if request.endpoint in (None, 'static'):
+            return
+        if self.should_profile(request.endpoint, request.headers.get('X-Profile')):
+            self._ensure_thread()
+            with self._lock:
+                self._active[threading.get_ident()] = request.endpoint
+                self.requests[request.endpoint] += 1
+            g.profiling = True
+            self._wake.set()
+
+    def _teardown_request(self, exc):
+        if g.pop('profiling', False):
+            with self._lock:
+                self._active.pop(threading.get_ident(), None)
+
+    # ------------------------------------------------------------------
+    # Sampler
+    # ------------------------------------------------------------------
+
+    def _ensure_thread(self):
+        # A thread started before a fork doesn't exist in the child
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                idle = not self._active
+            if idle:
+                # Sleep until a profiled request arrives instead of polling
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            self._sample()
+            time.sleep(self.interval)
+
+    def _sample(self):
+        with self._lock:
+            active = list(self._active.items())
+        frames = sys._current_frames()
+        samples = []
+        for ident, route in active:
+            frame = frames.get(ident)
+            codes = []
+            while frame is not None and len(codes) < MAX_DEPTH:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            if codes:
+                leaf = frames[ident]
+                hotspot = (f"{os.path.basename(leaf.f_code.co_filename)}:{leaf.f_lineno} "
+                           f"{leaf.f_code.co_name}")
+                stack = ';'.join(_frame_label(c) for c in reversed(codes))
+                samples.append((route, stack, hotspot, _category(codes)))
+        del frames
+        with self._lock:
+            for route, stack, hotspot, category in samples:
+                key = (route, stack)
+                if key not in self.stacks and len(self.stacks) >= MAX_STACKS:
+                    key = (route, '[other]')
+                self.stacks[key] += 1
+                self.hotspots[(route, hotspot)] += 1
+                self.categories[(route, category)] += 1
+
+    # ------------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------------
+
+    def collapsed(self, route=None):
+        """Collapsed-stack text for flamegraph.pl / speedscope"""
+        with self._lock:
+            items = sorted(self.stacks.items())
+        return ''.join(f"{r};{stack} {count}\n" for (r, stack), count in items
+                       if route is None or r == route)
+
+    def report(self, top=20, route=None):
+        """Per-route sample counts, SQL/template/Python split and top-N hotspots"""
+        with self._lock:
+            routes = {}
+            for (r, category), count in self.categories.items():
+                if route is not None and r != route:
+                    continue
+                entry = routes.setdefault(r, {'requests': self.requests[r], 'samples': 0,
+                                              'sql': 0, 'template': 0, 'python': 0})
+                entry[category] += count
+                entry['samples'] += count
+            hotspots = Counter()
+            for (r, spot), count in self.hotspots.items():
+                if route is None or r == route:
+                    hotspots[spot] += count
+        total = sum(hotspots.values()) or 1
+        return {
+            'interval': self.interval,
+            'sample_rate': self.sample_rate,
+            'routes_enabled': sorted(self.routes),
+            'routes': routes,
+            'hotspots': [{'location': spot, 'samples': count, 'percent': round(100 * count / total, 1)}
+                         for spot, count in hotspots.most_common(top)],
+        }
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.hotspots.clear()
+            self.categories.clear()
+            self.requests.clear()
@@ -25,7 +25,9 @@ CREATE TABLE CREW_MEMBER (
     FirstName VARCHAR(50) NOT NULL,
     LastName VARCHAR(50) NOT NULL,
     Specialization VARCHAR(100) NOT NULL,
-    LoyaltyScore INT NOT NULL CHECK (LoyaltyScore >= 0 AND LoyaltyScore <= 100)
+    LoyaltyScore INT NOT NULL CHECK (LoyaltyScore >= 0 AND LoyaltyScore <= 100),
+    RowVersion BIGINT NOT NULL DEFAULT 0,
+    UpdatedAt TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)
 );
 
 -- Table: RESOURCE
@@ -33,7 +35,9 @@ CREATE TABLE RESOURCE (
     ResourceID INT PRIMARY KEY AUTO_INCREMENT,
     Type VARCHAR(100) NOT NULL,
     CurrentQuantity INT NOT NULL CHECK (CurrentQuantity >= 0),
-    CriticalThreshold INT NOT NULL CHECK (CriticalThreshold >= 0)
+    CriticalThreshold INT NOT NULL CHECK (CriticalThreshold >= 0),
+    RowVersion BIGINT NOT NULL DEFAULT 0,
+    UpdatedAt TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)
 );
 
 -- Table: POLICE_UNIT
@@ -50,7 +54,9 @@ CREATE TABLE PLAN_PHASE (
     PhaseID INT PRIMARY KEY,
     Phasecodename VARCHAR(100) NOT NULL UNIQUE,
     Planned_Duration INT NOT NULL CHECK (Planned_Duration > 0),
-    Current_Dissonance INT DEFAULT 0 CHECK (Current_Dissonance >= 0)
+    Current_Dissonance INT DEFAULT 0 CHECK (Current_Dissonance >= 0),
+    RowVersion BIGINT NOT NULL DEFAULT 0,
+    UpdatedAt TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)
 );
 
 -- Table: HOSTAGE (depends on CREW_MEMBER and HEIST_BLUEPRINT)
@@ -63,6 +69,9 @@ CREATE TABLE HOSTAGE (
     InstigatorFlag BOOLEAN DEFAULT FALSE,
     ManagerCodename VARCHAR(50),
     BlueprintID INT,
+    RowVersion BIGINT NOT NULL DEFAULT 0,
+    UpdatedAt TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+    INDEX idx_hostage_facets (Status, Usefulness, InstigatorFlag),
     FOREIGN KEY (ManagerCodename) REFERENCES CREW_MEMBER(CodeName)
         ON DELETE SET NULL
         ON UPDATE CASCADE,
@@ -286,6 +295,189 @@ CREATE TABLE TASK_ASSIGNMENT (
         ON UPDATE CASCADE
 );
 
+-- =====================================================
+-- Change Feed
+-- =====================================================
+
+-- Table: CHANGE_LOG (one row per write to a synced table; deletes are tombstones)
+-- ChangeSeq is the sync cursor and is copied into the row's RowVersion
+CREATE TABLE CHANGE_LOG (
+    ChangeSeq BIGINT PRIMARY KEY AUTO_INCREMENT,
+    TableName VARCHAR(50) NOT NULL,
+    RowKey VARCHAR(50) NOT NULL,
+    Operation ENUM('upsert', 'delete') NOT NULL,
+    ChangedAt TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    INDEX idx_change_log_row (TableName, RowKey)
+);
+
+-- =====================================================
+-- Metric History
+-- =====================================================
+
+-- Table: METRIC_SAMPLE (append-only raw samples of loyalty / resource levels)
+CREATE TABLE METRIC_SAMPLE (
+    SampleID BIGINT PRIMARY KEY AUTO_INCREMENT,
+    Metric VARCHAR(30) NOT NULL,
+    EntityKey VARCHAR(50) NOT NULL,
+    RecordedAt TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    Value INT NOT NULL,
+    INDEX idx_metric_sample_series (Metric, EntityKey, RecordedAt),
+    INDEX idx_metric_sample_time (RecordedAt)
+);
+
+-- Table: METRIC_ROLLUP (minute/hour/day aggregates maintained on write)
+CREATE TABLE METRIC_ROLLUP (
+    Metric VARCHAR(30) NOT NULL,
+    EntityKey VARCHAR(50) NOT NULL,
+    Resolution ENUM('minute', 'hour', 'day') NOT NULL,
+    BucketStart DATETIME NOT NULL,
+    MinValue INT NOT NULL,
+    MaxValue INT NOT NULL,
+    SumValue BIGINT NOT NULL,
+    SampleCount INT NOT NULL,
+    LastValue INT NOT NULL,
+    PRIMARY KEY (Metric, EntityKey, Resolution, BucketStart),
+    INDEX idx_metric_rollup_retention (Resolution, BucketStart)
+);
+
+-- =====================================================
+-- Bulk Delete / Archive
+-- =====================================================
+
+-- Archive tables: ArchiveID, the live table's columns and ArchivedAt. The live
+-- primary/unique keys become plain indexes so an entity deleted twice (or a
+-- reused codename) keeps every archived copy; no foreign keys
+CREATE TABLE ARCHIVE_CREW_MEMBER LIKE CREW_MEMBER;
+ALTER TABLE ARCHIVE_CREW_MEMBER
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_crew_member_key (CodeName);
+
+CREATE TABLE ARCHIVE_HOSTAGE LIKE HOSTAGE;
+ALTER TABLE ARCHIVE_HOSTAGE
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_hostage_key (HostageID);
+
+CREATE TABLE ARCHIVE_PLAN_PHASE LIKE PLAN_PHASE;
+ALTER TABLE ARCHIVE_PLAN_PHASE
+    DROP PRIMARY KEY,
+    DROP INDEX Phasecodename,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_plan_phase_key (PhaseID);
+
+CREATE TABLE ARCHIVE_TRAITS LIKE TRAITS;
+ALTER TABLE ARCHIVE_TRAITS
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_traits_key (Crew_No, VolatileTraits);
+
+CREATE TABLE ARCHIVE_STRATEGIC_CREW LIKE STRATEGIC_CREW;
+ALTER TABLE ARCHIVE_STRATEGIC_CREW
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_strategic_crew_key (Codename);
+
+CREATE TABLE ARCHIVE_TACTICAL_CREW LIKE TACTICAL_CREW;
+ALTER TABLE ARCHIVE_TACTICAL_CREW
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_tactical_crew_key (Codename);
+
+CREATE TABLE ARCHIVE_TECHNICAL_CREW LIKE TECHNICAL_CREW;
+ALTER TABLE ARCHIVE_TECHNICAL_CREW
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_technical_crew_key (Codename);
+
+CREATE TABLE ARCHIVE_PSYCHOLOGICAL_REPORT LIKE PSYCHOLOGICAL_REPORT;
+ALTER TABLE ARCHIVE_PSYCHOLOGICAL_REPORT
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_psychological_report_key (Crew_Member, ReportTimestamp);
+
+CREATE TABLE ARCHIVE_HOSTAGE_LOG LIKE HOSTAGE_LOG;
+ALTER TABLE ARCHIVE_HOSTAGE_LOG
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_hostage_log_key (HostageID, Interaction_Timestamp);
+
+CREATE TABLE ARCHIVE_ASSIGNED_TO LIKE ASSIGNED_TO;
+ALTER TABLE ARCHIVE_ASSIGNED_TO
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_assigned_to_key (Cname, Phase_id);
+
+CREATE TABLE ARCHIVE_REQUIRES LIKE REQUIRES;
+ALTER TABLE ARCHIVE_REQUIRES
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_requires_key (Phase, Res_id);
+
+CREATE TABLE ARCHIVE_DEVIATES_FROM LIKE DEVIATES_FROM;
+ALTER TABLE ARCHIVE_DEVIATES_FROM
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_deviates_from_key (C_id, P_id);
+
+CREATE TABLE ARCHIVE_COMMUNICATES_WITH LIKE COMMUNICATES_WITH;
+ALTER TABLE ARCHIVE_COMMUNICATES_WITH
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_communicates_with_key (Codeid, Uid);
+
+CREATE TABLE ARCHIVE_IS_LOCATED_IN LIKE IS_LOCATED_IN;
+ALTER TABLE ARCHIVE_IS_LOCATED_IN
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_is_located_in_key (h_id, BPid);
+
+CREATE TABLE ARCHIVE_NEGOTIATION LIKE NEGOTIATION;
+ALTER TABLE ARCHIVE_NEGOTIATION
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_negotiation_key (P_unit, crew_id, Hostageid, resource_id);
+
+CREATE TABLE ARCHIVE_TASK_ASSIGNMENT LIKE TASK_ASSIGNMENT;
+ALTER TABLE ARCHIVE_TASK_ASSIGNMENT
+    DROP PRIMARY KEY,
+    ADD COLUMN ArchiveID BIGINT PRIMARY KEY AUTO_INCREMENT FIRST,
+    ADD COLUMN ArchivedAt DATETIME NOT NULL,
+    ADD INDEX idx_archive_task_assignment_key (PID, CName, ResID, BID);
+
+-- Table: BULK_JOB (progress of background bulk delete / archive jobs)
+CREATE TABLE BULK_JOB (
+    JobID INT PRIMARY KEY AUTO_INCREMENT,
+    Entity ENUM('crew', 'hostage', 'phase') NOT NULL,
+    Description VARCHAR(200),
+    Archive BOOLEAN NOT NULL DEFAULT FALSE,
+    Status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+    TotalEntities INT NOT NULL,
+    DoneEntities INT NOT NULL DEFAULT 0,
+    RowsDeleted INT NOT NULL DEFAULT 0,
+    RowsArchived INT NOT NULL DEFAULT 0,
+    Error TEXT,
+    Owner VARCHAR(100),          -- host:pid of the worker running the job
+    HeartbeatAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CreatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UpdatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
 -- =====================================================
 -- End of Schema
 -- =====================================================
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""Offline read-only snapshots of the whole database.
+
+export_snapshot() copies every base table into a single local SQLite file:
+same columns, tables clustered by their MySQL primary key (WITHOUT ROWID),
+and the MySQL secondary indexes recreated. SnapshotReader opens that file
+immutable and memory-mapped, so reads come straight out of the page cache
+with no copy into Python until a row is materialized, and runs the app's
+existing SELECT statements against it (the SQL the routes use is the common
+subset MySQL and SQLite share).
+
+Database uses a reader in 'fallback' mode (MySQL first, snapshot when MySQL
+is unreachable) or 'readonly' mode (all reads from the snapshot, writes
+refused).
+"""
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+import pymysql
+
+# MySQL DATA_TYPE -> SQLite declared type (DATETIME/TIMESTAMP get converters)
+SQLITE_TYPES = {
+    'tinyint': 'INTEGER', 'smallint': 'INTEGER', 'mediumint': 'INTEGER',
+    'int': 'INTEGER', 'bigint': 'INTEGER',
+    'decimal': 'NUMERIC', 'float': 'REAL', 'double': 'REAL',
+    'datetime': 'DATETIME', 'timestamp': 'TIMESTAMP', 'date': 'DATE',
+}
+
+BATCH_SIZE = 5000
+
+
+def _to_datetime(value):
+    return datetime.fromisoformat(value.decode())
+
+
+sqlite3.register_converter('DATETIME', _to_datetime)
+sqlite3.register_converter('TIMESTAMP', _to_datetime)
+
+
+def _sqlite_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    return value
+
+
+def _table_layout(conn):
+    """Columns, primary key and secondary indexes of every base table"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            ORDER BY TABLE_NAME, ORDINAL_POSITION
+        """)
+        columns = cursor.fetchall()
+        cursor.execute("""
+            SELECT t.TABLE_NAME, s.INDEX_NAME, s.NON_UNIQUE, s.COLUMN_NAME
+            FROM information_schema.TABLES t
+            JOIN information_schema.STATISTICS s
+              ON s.TABLE_SCHEMA = t.TABLE_SCHEMA AND s.TABLE_NAME = t.TABLE_NAME
+            WHERE t.TABLE_SCHEMA = DATABASE() AND t.TABLE_TYPE = 'BASE TABLE'
+            ORDER BY t.TABLE_NAME, s.INDEX_NAME, s.SEQ_IN_INDEX
+        """)
+        indexes = cursor.fetchall()
+
+    layout = {}
+    for row in indexes:
+        table = layout.setdefault(row['TABLE_NAME'], {'columns': [], 'primary': [], 'indexes': {}})
+        if row['INDEX_NAME'] == 'PRIMARY':
+            table['primary'].append(row['COLUMN_NAME'])
+        else:
+            index = table['indexes'].setdefault(row['INDEX_NAME'],
+                                                {'unique': not row['NON_UNIQUE'], 'columns': []})
+            index['columns'].append(row['COLUMN_NAME'])
+    for row in columns:
+        if row['TABLE_NAME'] in layout:
+            layout[row['TABLE_NAME']]['columns'].append(
+                (row['COLUMN_NAME'], SQLITE_TYPES.get(row['DATA_TYPE'].lower(), 'TEXT')))
+    return layout
+
+
+def export_snapshot(db, path):
+    """Dump every table into a new snapshot file at `path`; returns row counts.
+
+    The file is built next to `path` and renamed into place, so readers never
+    see a half-written snapshot.
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    out = sqlite3.connect(tmp_path)
+    out.execute("PRAGMA journal_mode = OFF")
+    out.execute("PRAGMA synchronous = OFF")
+    counts = {}
+    try:
+        with db.get_connection() as conn:
+            layout = _table_layout(conn)
+            for table, spec in sorted(layout.items()):
+                cols = ', '.join(f'"{name}" {kind}' for name, kind in spec['columns'])
+                if spec['primary']:
+                    pk = ', '.join(f'"{c}"' for c in spec['primary'])
+                    out.execute(f'CREATE TABLE "{table}" ({cols}, PRIMARY KEY ({pk})) WITHOUT ROWID')
+                else:
+                    out.execute(f'CREATE TABLE "{table}" ({cols})')
+
+                # Stream rows in primary key order so the clustered tree is built sequentially
+                order = f" ORDER BY {', '.join(spec['primary'])}" if spec['primary'] else ''
+                placeholders = ', '.join(['?'] * len(spec['columns']))
+                counts[table] = 0
+                with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+                    cursor.execute(f"SELECT * FROM {table}{order}")
+                    while True:
+                        rows = cursor.fetchmany(BATCH_SIZE)
+                        if not rows:
+                            break
+                        out.executemany(f'INSERT INTO "{table}" VALUES ({placeholders})',
+                                        [tuple(_sqlite_value(v) for v in row) for row in rows])
+                        counts[table] += len(rows)
+
+                for name, index in spec['indexes'].items():
+                    unique = 'UNIQUE ' if index['unique'] else ''
+                    cols = ', '.join(f'"{c}"' for c in index['columns'])
+                    out.execute(f'CREATE {unique}INDEX "{table}_{name}" ON "{table}" ({cols})')
+
+        out.execute("CREATE TABLE _SNAPSHOT_META (Name TEXT PRIMARY KEY, Value TEXT)")
+        out.execute("INSERT INTO _SNAPSHOT_META VALUES ('created_at', ?), ('source', ?)",
+                    (datetime.now().isoformat(' '), f"{db.host}/{db.database}"))
+        out.commit()
+        out.execute("ANALYZE")
+        out.close()
+        os.replace(tmp_path, path)
+    except Exception:
+        out.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return counts
+
+
+class SnapshotReader:
+    """Read-only, memory-mapped access to a snapshot file (one connection per thread)"""
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        mtime = os.path.getmtime(self.path)
+        # Reopen when a newer snapshot has been moved into place
+        if conn is None or self._local.mtime != mtime:
+            if conn is not None:
+                conn.close()
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True,
+                                   detect_types=sqlite3.PARSE_DECLTYPES)
+            conn.execute(f"PRAGMA mmap_size = {os.path.getsize(self.path)}")
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            self._local.mtime = mtime
+        return conn
+
+    @staticmethod
+    def translate(query):
+        """MySQL/pymysql placeholder style to sqlite3's"""
+        query = re.sub(r'\bFOR UPDATE\b', '', query)
+        return query.replace('%s', '?').replace('%%', '%')
+
+    def execute(self, query, params=None):
+        """Run a SELECT; returns (column names, row tuples)"""
+        params = tuple(_sqlite_value(v) for v in (params or ()))
+        cursor = self._connection().execute(self.translate(query), params)
+        columns = tuple(d[0] for d in cursor.description)
+        return columns, cursor.fetchall()
+
+    def created_at(self):
+        return self.execute("SELECT Value FROM _SNAPSHOT_META WHERE Name = 'created_at'")[1][0][0]